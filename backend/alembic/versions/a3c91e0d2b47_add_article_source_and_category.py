@@ -0,0 +1,35 @@
+"""Add article source and category
+
+Revision ID: a3c91e0d2b47
+Revises: 5fd0cc815104
+Create Date: 2026-10-19 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91e0d2b47'
+down_revision: Union[str, Sequence[str], None] = '5fd0cc815104'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('source', sa.String(), nullable=True))
+    op.add_column('articles', sa.Column('category_id', sa.String(), nullable=True))
+    op.create_index('ix_articles_source_category_id', 'articles', ['source', 'category_id'], unique=False)
+    # Backfill the source of already scraped articles from their URL
+    op.execute("UPDATE articles SET source = 'zenn' WHERE source IS NULL AND url LIKE 'https://zenn.dev/%'")
+    op.execute("UPDATE articles SET source = 'qiita' WHERE source IS NULL AND url LIKE 'https://qiita.com/%'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_articles_source_category_id', table_name='articles')
+    op.drop_column('articles', 'category_id')
+    op.drop_column('articles', 'source')
@@ -0,0 +1,34 @@
+"""Add article enrichment columns
+
+Revision ID: c7e4f1a9d305
+Revises: a3c91e0d2b47
+Create Date: 2026-10-19 14:03:51.562917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4f1a9d305'
+down_revision: Union[str, Sequence[str], None] = 'a3c91e0d2b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('sentiment_score', sa.Float(), nullable=True))
+    op.add_column('articles', sa.Column('keywords', sa.JSON(), nullable=True))
+    op.add_column('articles', sa.Column('enriched_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_articles_unenriched', 'articles', ['id'], unique=False, postgresql_where=sa.text('enriched_at IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_articles_unenriched', table_name='articles', postgresql_where=sa.text('enriched_at IS NULL'))
+    op.drop_column('articles', 'enriched_at')
+    op.drop_column('articles', 'keywords')
+    op.drop_column('articles', 'sentiment_score')
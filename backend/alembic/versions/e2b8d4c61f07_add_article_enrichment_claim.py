@@ -0,0 +1,28 @@
+"""Add article enrichment claim column
+
+Revision ID: e2b8d4c61f07
+Revises: c7e4f1a9d305
+Create Date: 2026-10-19 18:21:07.604183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8d4c61f07'
+down_revision: Union[str, Sequence[str], None] = 'c7e4f1a9d305'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('enrichment_claimed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'enrichment_claimed_at')
@@ -0,0 +1,28 @@
+"""Add article category rank
+
+Revision ID: f4a1c9e2b830
+Revises: e2b8d4c61f07
+Create Date: 2026-10-19 22:47:13.205691
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a1c9e2b830'
+down_revision: Union[str, Sequence[str], None] = 'e2b8d4c61f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('articles', sa.Column('category_rank', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('articles', 'category_rank')
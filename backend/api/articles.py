@@ -1,22 +1,30 @@
 # backend/api/articles.py セカンドペンギン
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 import logging
 import asyncio
-import random
 
 import crud
 import schemas
 import db_models as models
-from core.db import get_db
-from core.security import get_current_user
-from core import recommender
-from scraper import get_rakuten_recipes, scrape_zenn_news, scrape_qiita_news
+from core.config import settings
+from core.db import get_db, SessionLocal
+from core.security import get_current_user, get_current_user_detached
+from core import recommender, prewarm
+from core.catalog import catalog
+from core.favorites import favorite_writer
+from models import Article as ScrapedArticle
+from scraper import get_rakuten_recipes, scrape_zenn_news, scrape_qiita_news, SOURCE_ZENN, SOURCE_QIITA, SOURCE_RAKUTEN
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# "programming" カテゴリに表示する取得元
+PROGRAMMING_SOURCES = (SOURCE_ZENN, SOURCE_QIITA)
+
 @router.get("/{category_id}", response_model=List[schemas.Article])
 async def get_articles(category_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     """
@@ -40,29 +48,112 @@ async def get_articles(category_id: str, db: Session = Depends(get_db), current_
                 crud.create_article(db, article=article_schema)#所得した記事wpデータベースに新規保存
         
         # Ensure the database doesn't grow too large
-        crud.cull_old_articles(db, max_count=200) #最大総数200件で古いやつを削除
+        crud.cull_old_articles(db, max_count=200, sources=PROGRAMMING_SOURCES) #最大総数200件で古いやつを削除 (楽天レシピは対象外)
 
-        # Fetch all programming articles from the DB and return a random sample
-        all_db_articles = crud.get_all_articles(db) #dbからすべての記事の取得
-        sample_size = min(15, len(all_db_articles)) #最大で15件までの表示になるようにする
-        return random.sample(all_db_articles, sample_size)# ランダムに取得してきたサンプルサイズの指定してきた感じを返す
+        # Sample programming article ids from the in-memory catalog and load only those from the DB
+        catalog.ensure_loaded(db)
+        sampled_ids = catalog.sample_ids(PROGRAMMING_SOURCES, 15) #最大で15件までの表示になるようにする
+        return crud.get_articles_by_ids(db, sampled_ids)
     
     else:
         # Assume it's a Rakuten category ID
+        # プリウォーム済みのレシピをインデックス経由でDBから返す
+        recipes = crud.get_articles_by_category(db, source=SOURCE_RAKUTEN, category_id=category_id)
+        if recipes:
+            return recipes
+
+        # まだプリウォームされていないカテゴリはその場で取得して保存する
         rakuten_recipes = await get_rakuten_recipes(category_id)
-        # Note: These are not saved to the database
-        return [
-            schemas.Article(
-                id=30000 + i, # 1時的な ID
-                title=recipe.title,
-                url=recipe.url,
-                published_date=recipe.published_date,
-                summary=recipe.summary,
-                thumbnail_url=recipe.thumbnail_url,
-                sentiment=recipe.sentiment,
-            )
-            for i, recipe in enumerate(rakuten_recipes)
-        ]
+        await prewarm.store_recipes(rakuten_recipes)
+        return crud.get_articles_by_category(db, source=SOURCE_RAKUTEN, category_id=category_id)
+
+def _load_cached_articles(category_id: str) -> List[schemas.Article]:
+    """ストリームの最初に送る、DBにキャッシュ済みの記事を取得する"""
+    db = SessionLocal()
+    try:
+        if category_id == "programming":
+            catalog.ensure_loaded(db)
+            articles = crud.get_articles_by_ids(db, catalog.sample_ids(PROGRAMMING_SOURCES, 15))
+        else:
+            articles = crud.get_articles_by_category(db, source=SOURCE_RAKUTEN, category_id=category_id)
+        return [schemas.Article.model_validate(a) for a in articles]
+    finally:
+        db.close()
+
+
+def _store_new_articles(scraped: List[ScrapedArticle]) -> List[schemas.Article]:
+    """スクレイピング結果を一括保存し、DBに無かった記事だけを返す"""
+    db = SessionLocal()
+    try:
+        urls = [a.url for a in scraped if a.url]
+        known_urls = {a.url for a in crud.get_articles_by_urls(db, urls)}
+        crud.bulk_upsert_articles(db, [schemas.ArticleCreate(**a.model_dump()) for a in scraped])
+        new_urls = [url for url in urls if url not in known_urls]
+        if not new_urls:
+            return []
+        # 取得元の順番 (楽天レシピならランキング順) のまま返す
+        stored = {a.url: a for a in crud.get_articles_by_urls(db, new_urls)}
+        return [schemas.Article.model_validate(stored[url]) for url in new_urls if url in stored]
+    finally:
+        db.close()
+
+
+def _cull_programming_articles() -> None:
+    db = SessionLocal()
+    try:
+        crud.cull_old_articles(db, max_count=200, sources=PROGRAMMING_SOURCES)
+    finally:
+        db.close()
+
+
+async def _stream_feed(category_id: str):
+    """
+    キャッシュ済みの記事をすぐに送り、その後は取得元ごとに完了した順で新着記事を送る (NDJSON, 1行1記事)。
+    FEED_STREAM_DEADLINE_SECONDS を過ぎた取得元は待たずにストリームを閉じる。
+    """
+    sent_ids = set()
+
+    cached = await run_in_threadpool(_load_cached_articles, category_id)
+    for article in cached:
+        sent_ids.add(article.id)
+        yield article.model_dump_json() + "\n"
+
+    if category_id == "programming":
+        sources = [scrape_zenn_news(), scrape_qiita_news()]
+    elif not cached:
+        # プリウォーム前のカテゴリだけ楽天APIに取りに行く
+        sources = [get_rakuten_recipes(category_id)]
+    else:
+        return
+
+    tasks = [asyncio.create_task(source) for source in sources]
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=settings.FEED_STREAM_DEADLINE_SECONDS):
+            try:
+                scraped = await next_done
+            except asyncio.TimeoutError:
+                logger.warning(f"Feed stream deadline reached for category {category_id}")
+                break
+            for article in await run_in_threadpool(_store_new_articles, scraped):
+                if article.id not in sent_ids:
+                    sent_ids.add(article.id)
+                    yield article.model_dump_json() + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if category_id == "programming":
+        await run_in_threadpool(_cull_programming_articles)
+
+
+@router.get("/{category_id}/stream")
+async def stream_articles(category_id: str, current_user: models.User = Depends(get_current_user)):
+    """
+    get_articles のストリーミング版です。DBの記事を即座に返し、スクレイピング結果は完了した取得元から順に追加で返します。
+    レスポンスは NDJSON (1行に1記事のJSON) です。
+    """
+    logger.info(f"User: {current_user.email}, Category ID: {category_id} (stream)")
+    return StreamingResponse(_stream_feed(category_id), media_type="application/x-ndjson")
 
 # The rest of the file remains the same for favorites and recommendations
 
@@ -75,26 +166,61 @@ def get_recommendations(db: Session = Depends(get_db), current_user: models.User
     return recommended_articles
 
 
+def _user_with_favorites(user: models.User, favorite_ids: List[int]) -> schemas.User:
+    db = SessionLocal()
+    try:
+        favorite_articles = [schemas.Article.model_validate(a) for a in crud.get_articles_by_ids(db, favorite_ids)]
+    finally:
+        db.close()
+    return schemas.User(id=user.id, email=user.email, favorite_articles=favorite_articles)
+
+
+def _record_favorite(user: models.User, article_id: int, favorited: bool):
+    """
+    お気に入りの変更をまとめ書きのキューに入れ、(変更後のお気に入りID, 書き込み完了の Future) を返す。
+    既にお気に入りの記事を追加するときも記録する (まだコミットされていない追加の完了を待てるように)。
+    """
+    db = SessionLocal()
+    try:
+        if not crud.article_exists(db, article_id=article_id):
+            raise HTTPException(status_code=404, detail="Article not found")
+        favorite_ids = favorite_writer.favorite_ids(db, user_id=user.id)
+    finally:
+        db.close()
+    if favorited:
+        if article_id not in favorite_ids:
+            favorite_ids.append(article_id)
+    else:
+        if article_id not in favorite_ids:
+            raise HTTPException(status_code=404, detail="Article not in favorites")
+        favorite_ids.remove(article_id)
+    return favorite_ids, favorite_writer.record(user.id, article_id, favorited=favorited)
+
+
+async def _toggle_favorite(user: models.User, article_id: int, favorited: bool) -> schemas.User:
+    # バッチのコミットを待つ間にDB接続を持ち続けると、同時リクエストが多いときに接続プールが尽きて
+    # まとめ書き側が接続を取れなくなる。認証も含めて、DBを使う処理はそれぞれ短いセッションで行い、すぐに閉じる
+    favorite_ids, written = await run_in_threadpool(_record_favorite, user, article_id, favorited)
+    # 書き込みはまとめて行うが、応答はこの変更を含むバッチがコミットされてから返す
+    # (別のワーカーに振り分けられた次のリクエストからも変更が見えるように)
+    try:
+        await asyncio.wrap_future(written)
+    except Exception as e:
+        logger.error(f"[ERROR] Failed to save favorite for user {user.id}, article {article_id}: {e}")
+        raise HTTPException(status_code=503, detail="Failed to save favorite")
+    return await run_in_threadpool(_user_with_favorites, user, favorite_ids)
+
+
 @router.post("/{article_id}/favorite", response_model=schemas.User)
-def add_favorite(article_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    article = crud.get_article(db, article_id=article_id)
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    if article in current_user.favorite_articles:
-        return current_user
-    return crud.favorite_article(db=db, user=current_user, article=article)
+async def add_favorite(article_id: int, current_user: models.User = Depends(get_current_user_detached)):
+    return await _toggle_favorite(current_user, article_id, favorited=True)
 
 
 @router.delete("/{article_id}/favorite", response_model=schemas.User)
-def remove_favorite(article_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    article = crud.get_article(db, article_id=article_id)
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
-    if article not in current_user.favorite_articles:
-        raise HTTPException(status_code=404, detail="Article not in favorites")
-    return crud.unfavorite_article(db=db, user=current_user, article=article)
+async def remove_favorite(article_id: int, current_user: models.User = Depends(get_current_user_detached)):
+    return await _toggle_favorite(current_user, article_id, favorited=False)
 
 
 @router.get("/me/favorites", response_model=List[schemas.Article])
 def read_favorites(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return crud.get_favorite_articles(db=db, user=current_user)
+    return crud.get_articles_by_ids(db, favorite_writer.favorite_ids(db, user_id=current_user.id))
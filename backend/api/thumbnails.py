@@ -0,0 +1,41 @@
+# backend/api/thumbnails.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+import logging
+
+import crud
+from core import thumbnails
+from core.config import settings
+from core.db import get_db
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/{article_id}")
+async def get_article_thumbnail(
+    article_id: int,
+    request: Request,
+    size: str = Query("medium", pattern="^(small|medium|large)$"),
+    db: Session = Depends(get_db),
+):
+    """
+    記事のサムネイルを縮小してWebPで返します。元画像はサーバー側で取得してディスクにキャッシュします。
+    任意のURLを取得するプロキシにならないように、DBにある記事のサムネイルだけを扱います。
+    """
+    thumbnail_url = crud.get_article_thumbnail_url(db, article_id=article_id)
+    if not thumbnail_url:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+
+    try:
+        thumbnail = await thumbnails.get_thumbnail(thumbnail_url, size)
+    except Exception as e:
+        logger.error(f"[ERROR] Failed to fetch thumbnail for article {article_id}: {e}")
+        raise HTTPException(status_code=502, detail="Failed to fetch thumbnail")
+
+    # 画像の中身のハッシュをそのままETagにする (条件付きGETなら本文を返さない)
+    etag = f'"{thumbnail.content_hash}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.THUMBNAIL_MAX_AGE_SECONDS}"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=thumbnail.data, media_type=thumbnails.MEDIA_TYPE, headers=headers)
@@ -0,0 +1,92 @@
+# backend/benchmarks/collaborative_filtering.py
+"""
+協調フィルタリング (core.collaborative) の構築時間・問い合わせ時間・差分更新の時間を、合成データで計測するスクリプト。
+DBは使いません。記事の人気はジップ分布 (一部の記事にお気に入りが集中する) で作ります。
+
+使い方 (backend ディレクトリで実行):
+    python benchmarks/collaborative_filtering.py                      # 10万ユーザー, 5000記事, 平均10件
+    python benchmarks/collaborative_filtering.py --users 20000 --articles 2000 --favorites 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+def _synthetic_favorites(users: int, articles: int, favorites: int, seed: int):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, articles + 1) ** 0.8
+    popularity /= popularity.sum()
+    per_user = rng.poisson(favorites, size=users).clip(1, articles)
+    pairs = []
+    for user_id, count in enumerate(per_user):
+        for article_id in rng.choice(articles, size=count, replace=False, p=popularity):
+            pairs.append((user_id, int(article_id)))
+    return pairs, rng
+
+
+def _percentiles(samples):
+    samples = np.array(samples) * 1000
+    return f"p50 {np.percentile(samples, 50):7.2f} ms  p95 {np.percentile(samples, 95):7.2f} ms  max {samples.max():7.2f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--articles", type=int, default=5_000)
+    parser.add_argument("--favorites", type=int, default=10, help="1ユーザーあたりの平均お気に入り数")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--events", type=int, default=2_000, help="計測するお気に入り追加/解除の回数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from core.collaborative import ItemCooccurrence
+
+    pairs, rng = _synthetic_favorites(args.users, args.articles, args.favorites, args.seed)
+    print(f"users: {args.users}, articles: {args.articles}, favorites: {len(pairs)}")
+
+    engine = ItemCooccurrence()
+    started = time.perf_counter()
+    engine.build(pairs)
+    print(f"build (XᵀX)           : {(time.perf_counter() - started) * 1000:9.1f} ms, nnz {engine.base.nnz}")
+
+    favorites_by_user: dict[int, list[int]] = {}
+    for user_id, article_id in pairs:
+        favorites_by_user.setdefault(user_id, []).append(article_id)
+
+    def query_latencies():
+        latencies = []
+        for user_id in rng.integers(0, args.users, size=args.queries):
+            started = time.perf_counter()
+            engine.scores(favorites_by_user.get(int(user_id), []))
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    print(f"query                 : {_percentiles(query_latencies())}")
+
+    # お気に入りの追加と解除を交互に流す
+    latencies = []
+    for i in range(args.events):
+        user_id = int(rng.integers(0, args.users))
+        article_id = int(rng.integers(0, args.articles))
+        started = time.perf_counter()
+        if i % 2:
+            engine.remove((user_id, article_id))
+        else:
+            engine.add((user_id, article_id))
+        latencies.append(time.perf_counter() - started)
+    print(f"incremental update    : {_percentiles(latencies)}, pending delta {len(engine.delta)}")
+    print(f"query (with delta)    : {_percentiles(query_latencies())}")
+
+    started = time.perf_counter()
+    engine._fold()
+    print(f"fold delta into base  : {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
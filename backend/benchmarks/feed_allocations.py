@@ -0,0 +1,89 @@
+# backend/benchmarks/feed_allocations.py
+"""
+フィードのサンプリングで、ORMで全件読む方法と記事カタログを使う方法のメモリ確保量と時間を比べるスクリプト。
+
+使い方 (backend ディレクトリで実行):
+    python benchmarks/feed_allocations.py                 # 一時的な SQLite に1000件入れて計測
+    python benchmarks/feed_allocations.py --articles 5000
+    DATABASE_URL=postgresql://... python benchmarks/feed_allocations.py --no-seed   # 既存のDBで計測
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _measure(fn, repeat: int):
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=1000, help="投入する記事数")
+    parser.add_argument("--repeat", type=int, default=20, help="1方式あたりの繰り返し回数")
+    parser.add_argument("--no-seed", action="store_true", help="DATABASE_URL の既存データをそのまま使う")
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/feed_allocations.db"
+
+    import crud
+    import db_models as models
+    from core.catalog import catalog
+    from core.db import Base, SessionLocal, engine
+
+    db = SessionLocal()
+    if not args.no_seed:
+        Base.metadata.create_all(engine)
+        db.add_all(
+            models.Article(
+                title=f"記事タイトル {i}",
+                url=f"https://zenn.dev/bench/articles/{i}",
+                published_date=f"2025-09-{i % 28 + 1:02d}T10:00:00+09:00",
+                summary="ベンチマーク用の要約です。" * 5,
+                thumbnail_url=f"https://example.com/avatar/{i}.png",
+                source=random.choice(["zenn", "qiita"]),
+            )
+            for i in range(args.articles)
+        )
+        db.commit()
+
+    def orm_sample():
+        all_db_articles = crud.get_all_articles(db)
+        random.sample(all_db_articles, min(15, len(all_db_articles)))
+        db.expunge_all()
+
+    def catalog_sample():
+        catalog.ensure_loaded(db)
+        crud.get_articles_by_ids(db, catalog.sample_ids(["zenn", "qiita"], 15))
+        db.expunge_all()
+
+    # カタログ自体の大きさ (一度だけ読み込むコスト)
+    tracemalloc.start()
+    catalog.load(crud.get_catalog_rows(db))
+    catalog_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"articles: {len(catalog)}, repeat: {args.repeat}")
+    print(f"catalog resident size : {catalog_bytes / 1024:8.1f} KiB")
+    print(f"{'method':<16} {'ms/request':>11} {'peak alloc':>12}")
+    for name, fn in (("ORM (all rows)", orm_sample), ("catalog", catalog_sample)):
+        elapsed, peak = _measure(fn, args.repeat)
+        print(f"{name:<16} {elapsed * 1000:11.2f} {peak / 1024:9.1f} KiB")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# backend/benchmarks/import_profile.py
+"""
+アプリのインポート時間とメモリを計測するスクリプト (`python -X importtime` の集計)。
+
+使い方 (backend ディレクトリで実行):
+    python benchmarks/import_profile.py            # main をインポートしたときのプロファイル
+    python benchmarks/import_profile.py --warm-up  # 推薦モジュールのウォームアップ込み
+    python benchmarks/import_profile.py --top 30
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# "import time:       123 |       4567 |   package.module"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# 子プロセスの最大RSSを出力するコード (ru_maxrss は Linux では KB 単位)
+CHILD_CODE = """
+import resource
+import main
+{warm_up}
+print("MAXRSS_KB", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def run_profile(warm_up: bool):
+    env = dict(os.environ)
+    # DBやネットワークには触れずにインポートだけを計測する
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env["RAKUTEN_PREWARM_ENABLED"] = "false"
+    env["RECOMMENDER_WARMUP"] = "false"
+    code = CHILD_CODE.format(warm_up="from core import recommender; recommender.warm_up()" if warm_up else "")
+
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        sys.exit(proc.stderr)
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(cumulative_us), int(self_us), len(indent), name))
+
+    max_rss_kb = next(int(line.split()[1]) for line in proc.stdout.splitlines() if line.startswith("MAXRSS_KB"))
+    return wall, max_rss_kb, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warm-up", action="store_true", help="recommender.warm_up() まで実行して計測する")
+    parser.add_argument("--top", type=int, default=20, help="表示するモジュール数")
+    args = parser.parse_args()
+
+    wall, max_rss_kb, entries = run_profile(args.warm_up)
+
+    # 最上位 (インデントが最小) のインポートの合計が、インポートにかかった総時間
+    top_level = min((indent for _, _, indent, _ in entries), default=0)
+    total_import_us = sum(cumulative for cumulative, _, indent, _ in entries if indent == top_level)
+
+    print(f"wall time (process)  : {wall * 1000:8.1f} ms")
+    print(f"total import time    : {total_import_us / 1000:8.1f} ms")
+    print(f"max RSS              : {max_rss_kb / 1024:8.1f} MB")
+    print(f"modules imported     : {len(entries)}")
+    print()
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, _, name in sorted(entries, reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# backend/benchmarks/worker_scaling.py
+"""
+gunicorn のワーカー数ごとに、ワーカー1つあたりのメモリとスループットを計測するスクリプト (Linux専用)。
+
+使い方 (backend ディレクトリで実行):
+    python benchmarks/worker_scaling.py                       # 1, 2, 4 ワーカーで "/" を計測
+    python benchmarks/worker_scaling.py --workers 1 2 4 8 --duration 20
+    python benchmarks/worker_scaling.py --path /api/categories/cooking
+
+メモリは /proc/<pid>/smaps_rollup から読みます。
+- RSS: プロセスが触っている物理メモリ (共有ページも全部数える)
+- PSS: 共有ページをプロセス数で割って按分した値
+- USS: そのプロセスだけが持っているページ (ワーカーを1つ増やすと実際に増えるメモリ)
+preload_app で fork 前に読み込んだモジュールは共有されるので、USS が RSS より大きく下回るはずです。
+
+負荷はこのプロセスから httpx で掛けるため、負荷側がCPUを1コア使います。
+コア数に対するスケーリングを正確に見るときは wrk などの外部ツールを使ってください。
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _children(pid: int) -> list[int]:
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def _memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "uss": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def _wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server did not become ready: {url}")
+
+
+async def _load(url: str, concurrency: int, duration: float, headers: dict) -> tuple[int, int]:
+    done = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal done, errors
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code < 400:
+                    done += 1
+                else:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=10.0) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return done, errors
+
+
+def run(workers: int, args) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env["WEB_CONCURRENCY"] = str(workers)
+    # 計測したいのはリクエスト処理なので、DBを前提にしたバックグラウンド処理は止める
+    env["RAKUTEN_PREWARM_ENABLED"] = "false"
+    env["ENRICHMENT_ENABLED"] = "false"
+    env["THUMBNAIL_PREFETCH_ENABLED"] = "false"
+    bind = f"127.0.0.1:{args.port}"
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", bind, "--log-level", "warning", "main:app"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        url = f"http://{bind}{args.path}"
+        _wait_until_ready(url)
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        done, errors = asyncio.run(_load(url, args.concurrency, args.duration, headers))
+
+        worker_pids = _children(server.pid)
+        memories = [_memory_kb(pid) for pid in worker_pids]
+        master = _memory_kb(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    def avg(key):
+        return sum(m[key] for m in memories) / max(len(memories), 1) / 1024
+
+    return {
+        "workers": workers,
+        "rps": done / args.duration,
+        "errors": errors,
+        "master_rss": master["rss"] / 1024,
+        "rss": avg("rss"),
+        "pss": avg("pss"),
+        "uss": avg("uss"),
+        "total_pss": (sum(m["pss"] for m in memories) + master["pss"]) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/", help="負荷を掛けるパス")
+    parser.add_argument("--token", help="認証が必要なパス用のアクセストークン")
+    parser.add_argument("--duration", type=float, default=10.0, help="1構成あたりの計測秒数")
+    parser.add_argument("--concurrency", type=int, default=64, help="同時接続数")
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    print(f"cpu cores: {os.cpu_count()}, path: {args.path}, concurrency: {args.concurrency}")
+    print(f"{'workers':>7} {'req/s':>9} {'errors':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} {'total PSS':>10}")
+    for workers in args.workers:
+        r = run(workers, args)
+        print(
+            f"{r['workers']:7d} {r['rps']:9.1f} {r['errors']:7d} {r['rss']:9.1f}MB "
+            f"{r['pss']:9.1f}MB {r['uss']:9.1f}MB {r['total_pss']:8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
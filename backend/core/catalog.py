@@ -0,0 +1,172 @@
+# backend/core/catalog.py
+# 記事のID・公開日時・取得元・URLだけを列ごとの配列で持つ、プロセス内の軽量な記事カタログ。
+# フィードのサンプリングや推薦の候補選びで、毎回ORMオブジェクトを最大1000件作らずに済むようにする。
+import random
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+import crud
+from core import events
+from core.config import settings
+from scraper import SOURCE_ZENN, SOURCE_QIITA, SOURCE_RAKUTEN
+
+# 取得元を1バイトのコードで持つ (0 は不明)
+SOURCE_CODES = {SOURCE_ZENN: 1, SOURCE_QIITA: 2, SOURCE_RAKUTEN: 3}
+
+# 削除済みの行がこの割合を超えたら詰め直す
+COMPACT_RATIO = 0.25
+
+
+def _timestamp(published_date: Optional[str]) -> float:
+    """"2025-09-10T12:34:56+09:00" や楽天の "2025/09/10 12:34:56" をUNIX時刻にする。読めなければ0"""
+    if not published_date:
+        return 0.0
+    try:
+        return datetime.fromisoformat(published_date.replace("/", "-")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class CatalogSnapshot(NamedTuple):
+    """ある時点のカタログの行。generation が変わると行番号の対応が変わる"""
+    generation: int
+    ids: array
+    alive: bytes
+
+
+class ArticleCatalog:
+    """
+    記事の列 (ids, published, sources, urls) を行番号で揃えて持つカタログ。
+    行番号は推薦で使うTF-IDF行列の行番号と一致する。削除は alive を0にするだけで、
+    削除済みが溜まったら詰め直して generation を進める。
+    DBとは events の ARTICLES_UPSERTED / ARTICLES_DELETED で同期し、
+    他のワーカーでの変更は CATALOG_REFRESH_SECONDS ごとの再読み込みで取り込む。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.loaded_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self):
+        self.ids = array("q")
+        self.published = array("d")
+        self.sources = array("B")
+        self.urls: List[str] = []
+        self.alive = bytearray()
+        self.row_of: dict[int, int] = {}
+        self.dead = 0
+        self.generation += 1
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.dead
+
+    def _append(self, article_id: int, url: str, published_date: Optional[str], source: Optional[str]):
+        self.row_of[article_id] = len(self.ids)
+        self.ids.append(article_id)
+        self.published.append(_timestamp(published_date))
+        self.sources.append(SOURCE_CODES.get(source, 0))
+        self.urls.append(sys.intern(url))
+        self.alive.append(1)
+
+    # --- DBとの同期 ---
+    def load(self, rows: Iterable) -> None:
+        """
+        (id, url, published_date, source) の行でカタログを読み込む。
+        2回目以降は作り直さずに差分 (無くなった記事の削除、増えた記事の追加) だけを反映し、
+        行番号と generation を保つ (推薦のTF-IDF行列を学習し直さずに済むように)。
+        """
+        with self.lock:
+            if self.loaded_at is None:
+                self._reset()
+                for row in rows:
+                    self._append(row.id, row.url, row.published_date, row.source)
+            else:
+                fresh = {row.id: row for row in rows}
+                for article_id, index in list(self.row_of.items()):
+                    row = fresh.pop(article_id, None)
+                    if row is None:
+                        del self.row_of[article_id]
+                        self.alive[index] = 0
+                        self.dead += 1
+                    else:
+                        self.published[index] = _timestamp(row.published_date)
+                        self.sources[index] = SOURCE_CODES.get(row.source, 0)
+                for article_id in sorted(fresh):
+                    row = fresh[article_id]
+                    self._append(row.id, row.url, row.published_date, row.source)
+                if self.dead > len(self.ids) * COMPACT_RATIO:
+                    self._compact()
+            self.loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session) -> None:
+        """未読み込みか、最後の読み込みから CATALOG_REFRESH_SECONDS 経っていればDBから読み込む"""
+        loaded_at = self.loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < settings.CATALOG_REFRESH_SECONDS:
+            return
+        self.load(crud.get_catalog_rows(db))
+
+    def upsert(self, rows: Iterable) -> None:
+        """ARTICLES_UPSERTED のハンドラ"""
+        if self.loaded_at is None:
+            return # まだ読み込んでいなければ、初回の読み込みで反映される
+        with self.lock:
+            for row in rows:
+                index = self.row_of.get(row.id)
+                if index is None:
+                    self._append(row.id, row.url, row.published_date, row.source)
+                else:
+                    self.published[index] = _timestamp(row.published_date)
+                    self.sources[index] = SOURCE_CODES.get(row.source, 0)
+
+    def delete(self, article_ids: Iterable[int]) -> None:
+        """ARTICLES_DELETED のハンドラ"""
+        if self.loaded_at is None:
+            return
+        with self.lock:
+            for article_id in article_ids:
+                index = self.row_of.pop(article_id, None)
+                if index is not None and self.alive[index]:
+                    self.alive[index] = 0
+                    self.dead += 1
+            if self.dead > len(self.ids) * COMPACT_RATIO:
+                self._compact()
+
+    def _compact(self):
+        old = (self.ids, self.published, self.sources, self.urls, self.alive)
+        self._reset()
+        for article_id, published, source, url, alive in zip(*old):
+            if alive:
+                self.row_of[article_id] = len(self.ids)
+                self.ids.append(article_id)
+                self.published.append(published)
+                self.sources.append(source)
+                self.urls.append(url)
+                self.alive.append(1)
+
+    # --- 読み出し ---
+    def sample_ids(self, sources: Iterable[str], k: int) -> List[int]:
+        """指定した取得元の記事IDをランダムに最大k件返す"""
+        codes = {SOURCE_CODES[source] for source in sources if source in SOURCE_CODES}
+        with self.lock:
+            candidates = [
+                self.ids[row] for row in range(len(self.ids))
+                if self.alive[row] and self.sources[row] in codes
+            ]
+        return random.sample(candidates, min(k, len(candidates)))
+
+    def snapshot(self) -> CatalogSnapshot:
+        with self.lock:
+            return CatalogSnapshot(self.generation, self.ids[:], bytes(self.alive))
+
+
+catalog = ArticleCatalog()
+events.subscribe(events.ARTICLES_UPSERTED, catalog.upsert)
+events.subscribe(events.ARTICLES_DELETED, catalog.delete)
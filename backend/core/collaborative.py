@@ -0,0 +1,256 @@
+# backend/core/collaborative.py
+# favorites テーブルから作るアイテム間協調フィルタリング。
+#
+# X をユーザー×記事の0/1行列とすると、共起行列は C = XᵀX (対角成分は各記事のお気に入り数 n)。
+# 記事 i, j の類似度は C_ij / sqrt(n_i n_j) (コサイン類似度)。
+# お気に入りの追加・解除のたびに C を作り直さず、変化分 (そのユーザーの他のお気に入りとの組) だけを
+# 差分として溜め、差分が FOLD_THRESHOLD を超えたら疎行列の足し算で本体に畳み込む。
+#
+# 他のワーカーでの変更を取り込むための作り直し (favorites テーブルの全件読み込みと XᵀX) は重いので、
+# リクエストの中では行わず、lifespan から起動されるタスクが CF_REFRESH_SECONDS ごとに専用スレッドで行う。
+# 作り直している間も古い行列で問い合わせに答え、その間に届いた変更は入れ替えた後に適用し直す。
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+import crud
+from core import events
+from core.config import settings
+from core.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 差分の要素数がこれを超えたら本体の共起行列に畳み込む
+FOLD_THRESHOLD = 50_000
+
+# 作り直しは専用の1スレッドで行い、リクエスト用のスレッドプールを使わない
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collaborative")
+
+
+class ItemCooccurrence:
+    """
+    記事×記事の共起行列を持ち、ユーザーのお気に入りから記事ごとのスコアを計算する。
+    記事IDは列番号 (index_of) に対応付け、記事が増えたら行列を広げる。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+        # 作り直しの間に届いた変更 (適用する関数, 引数)。作り直していないときは None
+        self._replay: Optional[list[tuple[Callable, tuple]]] = None
+        self._reset()
+
+    def _reset(self):
+        self.article_ids: list[int] = []
+        self.index_of: dict[int, int] = {}
+        self.user_items: dict[int, set[int]] = {}
+        self.base = None # scipy は build するまで読み込まない
+        self.delta: dict[tuple[int, int], int] = {}
+        self._delta_csr = None # delta を疎行列にしたもののキャッシュ
+        # 削除された記事の列番号 (次の作り直しまでスコアに含めない)
+        self.deleted: set[int] = set()
+
+    def _base(self, size: int):
+        """本体の共起行列を、記事数に合わせて広げて返す"""
+        self.base.resize((size, size))
+        return self.base
+
+    def _index(self, article_id: int) -> int:
+        index = self.index_of.get(article_id)
+        if index is None:
+            index = self.index_of[article_id] = len(self.article_ids)
+            self.article_ids.append(article_id)
+        return index
+
+    # --- 構築と差分更新 ---
+    def _start_recording(self) -> None:
+        """ここから後に届いた変更を、作り直した行列に適用し直せるように記録し始める"""
+        with self.lock:
+            if self._replay is None:
+                self._replay = []
+
+    def build(self, favorites: Iterable[tuple[int, int]]) -> None:
+        """
+        (user_id, article_id) の組から共起行列を作り直す (C = XᵀX)。
+        計算はロックの外で行い、入れ替えるときだけロックを取る。
+        """
+        from scipy.sparse import csr_matrix
+        import numpy as np
+
+        self._start_recording()
+        article_ids: list[int] = []
+        index_of: dict[int, int] = {}
+        user_items: dict[int, set[int]] = {}
+        user_index: dict[int, int] = {}
+        rows, columns = [], []
+        for user_id, article_id in favorites:
+            column = index_of.get(article_id)
+            if column is None:
+                column = index_of[article_id] = len(article_ids)
+                article_ids.append(article_id)
+            items = user_items.setdefault(user_id, set())
+            if column in items:
+                continue
+            items.add(column)
+            rows.append(user_index.setdefault(user_id, len(user_index)))
+            columns.append(column)
+        x = csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+            shape=(len(user_index), len(article_ids)),
+        )
+        base = (x.T @ x).tocsr()
+
+        with self.lock:
+            self._reset()
+            self.article_ids, self.index_of, self.user_items, self.base = article_ids, index_of, user_items, base
+            self.loaded_at = time.monotonic()
+            # 読み込み以降に届いた変更を適用し直す (読み込みに含まれていたものは _apply_locked が無視する)
+            replay, self._replay = self._replay or [], None
+            for apply, args in replay:
+                apply(*args)
+
+    def refresh(self) -> None:
+        """favorites テーブルから作り直す (他のワーカーでの変更を取り込む)"""
+        started = time.perf_counter()
+        # 読み込みとの間に届いた変更を取りこぼさないように、読み込む前から記録を始める
+        self._start_recording()
+        db = SessionLocal()
+        try:
+            favorites = crud.get_all_favorites(db)
+        finally:
+            db.close()
+        self.build(favorites)
+        logger.info(f"Rebuilt item co-occurrence from {len(favorites)} favorites in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def _apply(self, user_id: int, article_id: int, sign: int) -> None:
+        with self.lock:
+            if self._replay is not None:
+                self._replay.append((self._apply_locked, (user_id, article_id, sign)))
+            if self.loaded_at is None:
+                return # まだ構築していなければ、初回の構築で反映される
+            self._apply_locked(user_id, article_id, sign)
+
+    def _apply_locked(self, user_id: int, article_id: int, sign: int) -> None:
+        column = self._index(article_id)
+        items = self.user_items.setdefault(user_id, set())
+        if (sign > 0) == (column in items):
+            return # 既に反映済み
+        if sign > 0:
+            items.add(column)
+        else:
+            items.discard(column)
+        # このユーザーの他のお気に入りとの共起と、自分自身 (対角 = お気に入り数) を増減する
+        for other in items | {column}:
+            self.delta[(column, other)] = self.delta.get((column, other), 0) + sign
+            if other != column:
+                self.delta[(other, column)] = self.delta.get((other, column), 0) + sign
+        self._delta_csr = None
+        if len(self.delta) > FOLD_THRESHOLD:
+            self._fold()
+
+    def _delete_locked(self, article_ids: Iterable[int]) -> None:
+        for article_id in article_ids:
+            column = self.index_of.get(article_id)
+            if column is None:
+                continue
+            self.deleted.add(column)
+            for items in self.user_items.values():
+                items.discard(column)
+
+    def delete_articles(self, article_ids) -> None:
+        """ARTICLES_DELETED のハンドラ。削除された記事はスコアの対象からも、お気に入りの側からも外す"""
+        article_ids = list(article_ids)
+        with self.lock:
+            if self._replay is not None:
+                self._replay.append((self._delete_locked, (article_ids,)))
+            if self.loaded_at is not None:
+                self._delete_locked(article_ids)
+
+    def add(self, payload) -> None:
+        """FAVORITE_ADDED のハンドラ (payload: (user_id, article_id))"""
+        self._apply(*payload, sign=1)
+
+    def remove(self, payload) -> None:
+        """FAVORITE_REMOVED のハンドラ (payload: (user_id, article_id))"""
+        self._apply(*payload, sign=-1)
+
+    def _delta_matrix(self, size: int):
+        from scipy.sparse import csr_matrix
+        import numpy as np
+
+        if not self.delta:
+            return None
+        if self._delta_csr is None or self._delta_csr.shape[0] != size:
+            keys = np.array(list(self.delta.keys()), dtype=np.int64)
+            values = np.fromiter(self.delta.values(), dtype=np.float32, count=len(self.delta))
+            self._delta_csr = csr_matrix((values, (keys[:, 0], keys[:, 1])), shape=(size, size))
+        return self._delta_csr
+
+    def _fold(self):
+        size = len(self.article_ids)
+        delta = self._delta_matrix(size)
+        if delta is not None:
+            self.base = (self._base(size) + delta).tocsr()
+            self.base.eliminate_zeros()
+        self.delta = {}
+        self._delta_csr = None
+
+    # --- 問い合わせ ---
+    def scores(self, favorite_ids: Iterable[int]) -> dict[int, float]:
+        """
+        お気に入り記事との類似度の合計を {記事ID: スコア} で返す (お気に入り自身と0点の記事は含まない)。
+        score_j = Σ_f C_fj / sqrt(n_f n_j)
+        """
+        import numpy as np
+
+        with self.lock:
+            size = len(self.article_ids)
+            favorites = [self.index_of[a] for a in favorite_ids if a in self.index_of]
+            favorites = [column for column in favorites if column not in self.deleted]
+            if not favorites:
+                return {}
+            base = self._base(size)
+            rows = base[favorites]
+            delta = self._delta_matrix(size)
+            if delta is not None:
+                rows = rows + delta[favorites]
+            counts = base.diagonal()
+            if delta is not None:
+                counts = counts + delta.diagonal()
+            article_ids = self.article_ids[:]
+            deleted = list(self.deleted)
+
+        counts = np.maximum(counts, 0)
+        with np.errstate(divide="ignore"):
+            inverse_norm = np.where(counts > 0, 1.0 / np.sqrt(counts), 0.0)
+        # 各お気に入り行を 1/sqrt(n_f) で重み付けして足し、列を 1/sqrt(n_j) で割る
+        weighted = rows.multiply(inverse_norm[favorites][:, None]).sum(axis=0)
+        similarity = np.asarray(weighted).ravel() * inverse_norm
+        similarity[favorites] = 0.0
+        similarity[deleted] = 0.0
+        nonzero = np.flatnonzero(similarity > 0)
+        return {article_ids[i]: float(similarity[i]) for i in nonzero}
+
+
+cooccurrence = ItemCooccurrence()
+
+
+async def run_refresh_loop() -> None:
+    """lifespan からタスクとして起動される。起動直後と CF_REFRESH_SECONDS ごとに共起行列を作り直す"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(_executor, cooccurrence.refresh)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[ERROR] Failed to rebuild item co-occurrence: {e}")
+        await asyncio.sleep(settings.CF_REFRESH_SECONDS)
+
+
+events.subscribe(events.FAVORITE_ADDED, cooccurrence.add)
+events.subscribe(events.FAVORITE_REMOVED, cooccurrence.remove)
+events.subscribe(events.ARTICLES_DELETED, cooccurrence.delete_articles)
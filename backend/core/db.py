@@ -3,7 +3,25 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+# anyio のデフォルトのスレッドプールは40スレッドなので、1プロセスでそれ以上の接続は同時に使われない
+MAX_CONNECTIONS_PER_WORKER = 40
+
+def pool_limits(workers: int) -> tuple[int, int]:
+    """
+    Postgres の max_connections をワーカー数で分け合うように (pool_size, max_overflow) を決めます。
+    """
+    budget = settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS
+    per_worker = max(1, min(budget // max(workers, 1), MAX_CONNECTIONS_PER_WORKER))
+    pool_size = max(1, per_worker // 2)
+    return pool_size, per_worker - pool_size
+
+def _engine_options() -> dict:
+    if not settings.DATABASE_URL.startswith("postgresql"):
+        return {}
+    pool_size, max_overflow = pool_limits(settings.WEB_CONCURRENCY)
+    return {"pool_size": pool_size, "max_overflow": max_overflow, "pool_pre_ping": True}
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,209 @@
+# backend/core/enrichment.py
+# 保存された記事に感情 (sentiment) とキーワードを付ける、リクエストとは別に動くバッチ処理。
+# 記事の読み出しには一切関わらず、未処理 (enriched_at IS NULL) の記事をまとめて処理して列に書き込む。
+#
+# 1バッチは「確保 → 解析 → 書き込み」の3段階で、DBのトランザクション (行ロック) は確保と書き込みの間だけ開く。
+# 形態素解析は純Pythonで数秒かかるので、その間に同じ記事の upsert や削除を待たせないようにしている。
+# 解析は ENRICHMENT_PROCESSES 個の子プロセスで行い、リクエストを処理するスレッドとGILを取り合わないようにする。
+# 子プロセスは spawn で起動して scikit-learn と Janome の辞書を読み込み直すので、1つあたり約250MBを使い、
+# ワーカーとは共有されない。そのためバッチ処理はプリウォームと同じ advisory lock を取れた1ワーカーだけで動かす。
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from core import events
+from core.config import settings
+from core.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 組み込みの小さな感情辞書 (基本形 -> 極性)。SENTIMENT_LEXICON_PATH で差し替え・追加できる
+DEFAULT_LEXICON = {
+    # positive
+    "良い": 1.0, "いい": 1.0, "よい": 1.0, "最高": 1.0, "便利": 1.0, "簡単": 0.5, "楽しい": 1.0,
+    "嬉しい": 1.0, "美味しい": 1.0, "おいしい": 1.0, "うまい": 0.5, "人気": 0.5, "快適": 1.0,
+    "成功": 1.0, "改善": 0.5, "向上": 0.5, "高速": 0.5, "安全": 0.5, "安心": 0.5, "魅力": 0.5,
+    "感動": 1.0, "素晴らしい": 1.0, "手軽": 0.5, "爽やか": 0.5, "効率": 0.5, "おすすめ": 0.5,
+    "解決": 0.5, "優れる": 1.0, "好き": 1.0, "楽": 0.5,
+    # negative
+    "悪い": -1.0, "難しい": -0.5, "問題": -0.5, "失敗": -1.0, "エラー": -0.5, "バグ": -0.5,
+    "障害": -1.0, "不安": -1.0, "危険": -1.0, "脆弱": -1.0, "脆弱性": -1.0, "遅い": -0.5,
+    "辛い": -1.0, "つらい": -1.0, "面倒": -0.5, "苦手": -0.5, "嫌い": -1.0, "最悪": -1.0,
+    "炎上": -1.0, "損": -0.5, "不具合": -1.0, "攻撃": -1.0, "被害": -1.0, "廃止": -0.5,
+    "非推奨": -0.5, "困る": -0.5, "ミス": -0.5, "漏洩": -1.0, "ダメ": -1.0, "重い": -0.5,
+}
+
+# 処理件数などの計測値 (GET /metrics/enrichment で返す)
+metrics = {
+    "articles_enriched": 0,
+    "batches": 0,
+    "busy_seconds": 0.0,
+    "last_batch_size": 0,
+    "last_batch_articles_per_second": 0.0,
+}
+
+# DB処理は専用の1スレッドで行い、リクエスト用のスレッドプールを使わない
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enrichment")
+# 形態素解析用の子プロセス (最初のバッチで起動する)
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+_lexicon: Optional[dict[str, float]] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def load_lexicon() -> dict[str, float]:
+    """組み込みの辞書に、SENTIMENT_LEXICON_PATH のTSV (語\\t極性) を重ねて返す"""
+    global _lexicon
+    if _lexicon is None:
+        lexicon = dict(DEFAULT_LEXICON)
+        if settings.SENTIMENT_LEXICON_PATH:
+            with open(settings.SENTIMENT_LEXICON_PATH, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) >= 2 and not line.startswith("#"):
+                        lexicon[parts[0]] = float(parts[1])
+        _lexicon = lexicon
+    return _lexicon
+
+
+def analyze(texts: list[str], top_k: int) -> list[tuple[str, float, list[str]]]:
+    """
+    テキストのバッチをまとめて解析し、(sentiment, sentiment_score, keywords) を返す。
+    形態素解析は recommender.tokenize の結果を1回だけ作り、感情スコアとTF-IDFの両方で使う。
+    """
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+    import numpy as np
+
+    from core.recommender import tokenize
+
+    token_lists = [tokenize(text) for text in texts]
+    if not any(token_lists):
+        return [("neutral", 0.0, []) for _ in texts]
+
+    # 文書×語の出現回数行列 (トークン化済みのリストをそのまま使う)
+    counter = CountVectorizer(analyzer=lambda tokens: tokens)
+    counts = counter.fit_transform(token_lists)
+    vocabulary = counter.get_feature_names_out()
+
+    # 感情スコア = 辞書の極性の合計 / トークン数
+    lexicon = load_lexicon()
+    polarity = np.array([lexicon.get(term, 0.0) for term in vocabulary])
+    token_totals = np.maximum(np.asarray(counts.sum(axis=1)).ravel(), 1)
+    scores = (counts @ polarity) / token_totals
+
+    # キーワード = バッチ内のTF-IDFが高い語 (1文字の語は除く)
+    tfidf = TfidfTransformer().fit_transform(counts).tocsr()
+    usable = np.array([len(term) > 1 for term in vocabulary])
+
+    results = []
+    threshold = settings.SENTIMENT_THRESHOLD
+    for row, score in enumerate(scores):
+        start, end = tfidf.indptr[row], tfidf.indptr[row + 1]
+        columns, weights = tfidf.indices[start:end], tfidf.data[start:end]
+        keep = usable[columns]
+        columns, weights = columns[keep], weights[keep]
+        keywords = [str(vocabulary[c]) for c in columns[np.argsort(-weights, kind="stable")[:top_k]]]
+        label = "positive" if score > threshold else "negative" if score < -threshold else "neutral"
+        results.append((label, round(float(score), 4), keywords))
+    return results
+
+
+def _analyze_texts(texts: list[str]) -> list[tuple[str, float, list[str]]]:
+    """analyze を子プロセスで実行する (ENRICHMENT_PROCESSES が 0 なら呼び出したスレッドで実行する)"""
+    global _analysis_pool
+    if settings.ENRICHMENT_PROCESSES <= 0:
+        return analyze(texts, settings.ENRICHMENT_KEYWORDS)
+    if _analysis_pool is None:
+        # fork だと親のスレッドやDB接続を引き継いでしまうので spawn で起動する
+        _analysis_pool = ProcessPoolExecutor(
+            max_workers=settings.ENRICHMENT_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _analysis_pool.submit(analyze, texts, settings.ENRICHMENT_KEYWORDS).result()
+
+
+def enrich_pending_batch() -> int:
+    """
+    未処理の記事を最大 ENRICHMENT_BATCH_SIZE 件処理して保存する。処理した件数を返す。
+    記事は短いトランザクションで確保 (enrichment_claimed_at) してすぐにコミットするので、
+    複数ワーカーが同時に動いても同じ記事を処理せず、解析中に行ロックを持ち続けることもない。
+    """
+    import crud
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rows = crud.claim_unenriched_articles(
+            db, limit=settings.ENRICHMENT_BATCH_SIZE, claim_timeout_seconds=settings.ENRICHMENT_CLAIM_TIMEOUT_SECONDS
+        )
+    finally:
+        db.close()
+    if not rows:
+        return 0
+
+    # トランザクションを開いていない状態で解析する
+    results = _analyze_texts([(row.title or "") + " " + (row.summary or "") for row in rows])
+
+    # 解析中に削除された記事や、他で処理済みになった記事は書き込まれない
+    db = SessionLocal()
+    try:
+        crud.save_enrichment(db, [
+            {"id": row.id, "sentiment": sentiment, "sentiment_score": score, "keywords": keywords}
+            for row, (sentiment, score, keywords) in zip(rows, results)
+        ])
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    metrics["articles_enriched"] += len(rows)
+    metrics["batches"] += 1
+    metrics["busy_seconds"] += elapsed
+    metrics["last_batch_size"] = len(rows)
+    metrics["last_batch_articles_per_second"] = len(rows) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Enriched {len(rows)} articles in {elapsed * 1000:.0f}ms ({len(rows) / max(elapsed, 1e-9):.0f} articles/s)")
+    return len(rows)
+
+
+def _on_articles_upserted(rows) -> None:
+    """保存イベントを受けたらループを起こす (どのスレッドから呼ばれてもよい)"""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def run_enrichment_loop() -> None:
+    """
+    lifespan からタスクとして起動される。記事が保存されたとき、または ENRICHMENT_INTERVAL_SECONDS ごとに
+    未処理の記事がなくなるまでバッチ処理を繰り返す。マルチワーカー構成では、ロックを取れたワーカーだけが実行する。
+    """
+    global _loop, _wakeup, _analysis_pool
+    from core.prewarm import try_become_leader # 解析用の子プロセスが楽天APIまわりを読み込まないように、ここで読み込む
+
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    try:
+        while True:
+            try:
+                # 担当のワーカーが終わったら、残りのワーカーのどれかが次の周回で引き継ぐ
+                if not await _loop.run_in_executor(_executor, try_become_leader):
+                    logger.debug("Another worker is enriching articles")
+                else:
+                    while await _loop.run_in_executor(_executor, enrich_pending_batch) == settings.ENRICHMENT_BATCH_SIZE:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[ERROR] Article enrichment failed: {e}")
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.ENRICHMENT_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+    finally:
+        if _analysis_pool is not None:
+            _analysis_pool.shutdown(wait=False, cancel_futures=True)
+            _analysis_pool = None
+
+
+events.subscribe(events.ARTICLES_UPSERTED, _on_articles_upserted)
@@ -0,0 +1,32 @@
+# backend/core/events.py
+# 記事の保存・削除やお気に入りの変更を、プロセス内のキャッシュ (カタログや推薦のインデックス) に伝えるための簡単なイベント通知
+import logging
+from collections import defaultdict
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# payload: 保存された記事の行 (id, url, published_date, source, thumbnail_url を持つ) のリスト
+ARTICLES_UPSERTED = "articles_upserted"
+# payload: 削除された記事IDのリスト
+ARTICLES_DELETED = "articles_deleted"
+# payload: (user_id, article_id)
+FAVORITE_ADDED = "favorite_added"
+FAVORITE_REMOVED = "favorite_removed"
+
+_subscribers: dict[str, list[Callable[[Any], None]]] = defaultdict(list)
+
+def subscribe(event: str, handler: Callable[[Any], None]) -> None:
+    """イベントのハンドラを登録します。"""
+    _subscribers[event].append(handler)
+
+def publish(event: str, payload: Any) -> None:
+    """
+    登録されたハンドラを同期的に呼び出します。ハンドラの例外はログに残して握りつぶします
+    (キャッシュの更新失敗でDBへの書き込みを失敗させないため)。
+    """
+    for handler in _subscribers[event]:
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.error(f"[ERROR] Handler {handler.__qualname__} failed for {event}: {e}")
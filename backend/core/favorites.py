@@ -0,0 +1,156 @@
+# backend/core/favorites.py
+# お気に入りの追加・解除をメモリ上のキューに溜めて、まとめてDBに書き込む。
+#
+# - 同じ (ユーザー, 記事) への操作は最後の状態だけを残す (連打しても1件の書き込みになる)
+# - FAVORITES_FLUSH_INTERVAL_MS ごと、または FAVORITES_FLUSH_BATCH_SIZE 件溜まったら、
+#   追加は1つの INSERT ... ON CONFLICT DO NOTHING、解除は1つの DELETE で書き込む
+# - record() は操作を含むバッチのコミットで完了する Future を返す。APIはこれを待ってから応答するので、
+#   応答を受け取った時点で変更はDBにあり、どのワーカーに振り分けられたリクエストからも読める
+#   (書き込みはまとめたまま、応答までの遅れは最大 FAVORITES_FLUSH_INTERVAL_MS)
+# - コミット前の操作も favorite_ids() に重ねて返すので、応答を待っている間の同じワーカーからの読み出しにも反映される
+# - 実際に書き込まれた変更を FAVORITE_ADDED / FAVORITE_REMOVED として通知し、推薦の共起行列を更新する
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import crud
+from core import events
+from core.config import settings
+from core.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class FavoriteWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user_id -> {article_id: お気に入りにするか}
+        self._pending: dict[int, dict[int, bool]] = {}
+        self._pending_count = 0
+        # _pending のバッチがコミットされたら完了する Future
+        self._pending_done: Future = Future()
+        # 書き込み中のバッチ (コミットが終わるまで読み出しに反映する)
+        self._in_flight: dict[int, dict[int, bool]] = {}
+        self._flush_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="favorites")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self.metrics = {"events": 0, "coalesced": 0, "flushes": 0, "rows_written": 0}
+
+    # --- 記録と読み出し ---
+    def record(self, user_id: int, article_id: int, favorited: bool) -> Future:
+        """操作をキューに入れ、その操作を含むバッチが書き込まれたら完了する Future を返す (失敗時は例外が入る)"""
+        with self._lock:
+            user_pending = self._pending.setdefault(user_id, {})
+            if article_id in user_pending:
+                self.metrics["coalesced"] += 1
+            else:
+                self._pending_count += 1
+            user_pending[article_id] = favorited
+            self.metrics["events"] += 1
+            full = self._pending_count >= settings.FAVORITES_FLUSH_BATCH_SIZE
+            done = self._pending_done
+
+        loop = self._loop
+        if loop is None:
+            # バックグラウンドのループが動いていなければその場で書き込む
+            try:
+                self.flush()
+            except Exception:
+                pass # 例外は Future に入っている
+        elif full:
+            loop.call_soon_threadsafe(self._flush_requested.set)
+        return done
+
+    def favorite_ids(self, db: Session, user_id: int) -> list[int]:
+        """DBのお気に入りに、まだ書き込まれていない操作を重ねたお気に入り記事IDを返す"""
+        # 先に書き込み前の操作を写し取ってからDBを読む。逆の順番だと、その間にコミットされて
+        # _in_flight から消えた変更がどちらにも見えなくなる
+        with self._lock:
+            overlay = {**self._in_flight.get(user_id, {}), **self._pending.get(user_id, {})}
+        stored = crud.get_favorite_article_ids(db, user_id=user_id)
+        if not overlay:
+            return stored
+        ids = [article_id for article_id in stored if overlay.get(article_id, True)]
+        seen = set(ids)
+        ids.extend(article_id for article_id, favorited in overlay.items() if favorited and article_id not in seen)
+        return ids
+
+    # --- 書き込み ---
+    def flush(self) -> int:
+        """
+        溜まっている操作をまとめて書き込む。書き込んだ行数を返す。
+        失敗したバッチはキューに戻さず、待っている Future に例外を入れる (呼び出し元のAPIがエラーを返す)。
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending, self._pending_count = self._pending, {}, 0
+                done, self._pending_done = self._pending_done, Future()
+                self._in_flight = batch
+
+            # 行ロックの順番をそろえてワーカー間のデッドロックを避ける
+            adds = sorted((u, a) for u, items in batch.items() for a, favorited in items.items() if favorited)
+            removes = sorted((u, a) for u, items in batch.items() for a, favorited in items.items() if not favorited)
+            db = SessionLocal()
+            try:
+                try:
+                    added, removed = crud.apply_favorite_changes(db, adds, removes)
+                except IntegrityError:
+                    # 書き込みまでの間に削除された記事が含まれていたら、それを除いてやり直す
+                    db.rollback()
+                    existing = set(crud.get_existing_article_ids(db, [a for _, a in adds]))
+                    added, removed = crud.apply_favorite_changes(db, [(u, a) for u, a in adds if a in existing], removes)
+            except Exception as e:
+                with self._lock:
+                    self._in_flight = {}
+                done.set_exception(e)
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                self._in_flight = {}
+            self.metrics["flushes"] += 1
+            self.metrics["rows_written"] += len(added) + len(removed)
+        done.set_result(None)
+
+        for pair in added:
+            events.publish(events.FAVORITE_ADDED, tuple(pair))
+        for pair in removed:
+            events.publish(events.FAVORITE_REMOVED, tuple(pair))
+        return len(added) + len(removed)
+
+    async def run(self) -> None:
+        """lifespan からタスクとして起動される。一定間隔か、件数がたまったときに書き込む"""
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        interval = settings.FAVORITES_FLUSH_INTERVAL_MS / 1000
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
+                try:
+                    started = time.perf_counter()
+                    written = await self._loop.run_in_executor(self._executor, self.flush)
+                    if written:
+                        logger.debug(f"Flushed {written} favorite changes in {(time.perf_counter() - started) * 1000:.0f}ms")
+                except Exception as e:
+                    logger.error(f"[ERROR] Failed to flush favorites: {e}")
+        finally:
+            # 終了時は残っている操作をその場で書き込む
+            self._loop = None
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.flush)
+
+
+favorite_writer = FavoriteWriter()
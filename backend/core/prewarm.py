@@ -0,0 +1,155 @@
+# backend/core/prewarm.py
+# 楽天レシピのランキングを事前に取得してDBに保存するバックグラウンド処理
+import asyncio
+import logging
+import threading
+import time
+from typing import List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+import crud
+import schemas
+from api.categories import RAKUTEN_PARENT_CATEGORY_MAP
+from core.config import settings
+from core.db import SessionLocal, engine
+from models import Article
+from scraper import get_rakuten_categories, get_rakuten_recipes, SOURCE_RAKUTEN
+
+logger = logging.getLogger(__name__)
+
+# 複数ワーカーのうち1プロセスだけがプリウォーム (と感情・キーワードの付与) をするための Postgres advisory lock のキー
+PREWARM_LOCK_KEY = 2640426
+# ロックを持っている接続 (プロセスが終わるまで保持する)
+_leader_connection = None
+# プリウォームと感情付与のスレッドから同時に呼ばれても、ロック用の接続を1つだけ作るようにする
+_leader_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    同時実行数と1秒あたりのリクエスト数を制限する非同期レートリミッタ。
+    `async with limiter:` で囲んだ処理が制限の対象になります。
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_second: float):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        # 次に発行してよい時刻まで待つ (リクエスト間隔を一定に保つ)
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+def _store_recipes(recipes: List[Article]) -> int:
+    """スレッドプール上で実行される一括保存処理"""
+    # カテゴリごとの最新ランキングのURL (取得できたカテゴリだけを対象にする)
+    current_urls: dict[str, list[str]] = {}
+    for recipe in recipes:
+        current_urls.setdefault(recipe.category_id, []).append(recipe.url)
+    db = SessionLocal()
+    try:
+        stored = crud.bulk_upsert_articles(
+            db, [schemas.ArticleCreate(**recipe.model_dump()) for recipe in recipes]
+        )
+        # ランキングから外れたレシピを片付ける (残すとカテゴリページに古いレシピが溜まっていく)
+        retired = crud.retire_stale_category_articles(db, source=SOURCE_RAKUTEN, current_urls=current_urls)
+        if retired:
+            logger.info(f"Retired {retired} Rakuten recipes that dropped out of the rankings")
+        return stored
+    finally:
+        db.close()
+
+
+async def store_recipes(recipes: List[Article]) -> int:
+    """
+    レシピを articles テーブルに一括保存し、同じカテゴリでランキングから外れたレシピを削除します
+    (お気に入りに入っているレシピはカテゴリから外すだけで残します)。
+    同期DB処理はイベントループを塞がないようにスレッドで実行します。
+    """
+    if not recipes:
+        return 0
+    return await run_in_threadpool(_store_recipes, recipes)
+
+
+async def prewarm_rakuten_recipes() -> int:
+    """
+    RAKUTEN_PARENT_CATEGORY_MAP の全親カテゴリについて、サブカテゴリのランキングを並行取得して保存します。
+    保存したレシピの件数を返します。
+    """
+    limiter = RateLimiter(settings.RAKUTEN_MAX_CONCURRENCY, settings.RAKUTEN_REQUESTS_PER_SECOND)
+
+    async def limited(coro_fn, *args):
+        async with limiter:
+            return await coro_fn(*args)
+
+    started = time.perf_counter()
+    category_lists = await asyncio.gather(
+        *(limited(get_rakuten_categories, parent_id) for parent_id in RAKUTEN_PARENT_CATEGORY_MAP.values())
+    )
+    category_ids = [category.categoryId for categories in category_lists for category in categories]
+
+    rankings = await asyncio.gather(
+        *(limited(get_rakuten_recipes, category_id) for category_id in category_ids)
+    )
+    recipes = [recipe for ranking in rankings for recipe in ranking]
+    stored = await store_recipes(recipes)
+
+    logger.info(
+        f"Prewarmed {stored} Rakuten recipes from {len(category_ids)} categories "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return stored
+
+
+def try_become_leader() -> bool:
+    """
+    プリウォームなど、1プロセスだけで動かすバックグラウンド処理を担当するプロセスかどうかを返します。
+    Postgres ではセッション単位の advisory lock を取れたプロセスだけが担当になります。
+    """
+    global _leader_connection
+    with _leader_lock:
+        if _leader_connection is not None:
+            return True
+        if engine.dialect.name != "postgresql":
+            return True
+        connection = engine.connect()
+        locked = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": PREWARM_LOCK_KEY}).scalar()
+        # セッション単位のロックはコミット後も保持される (idle in transaction にしないためにコミットする)
+        connection.commit()
+        if locked:
+            _leader_connection = connection
+            return True
+        connection.close()
+        return False
+
+
+async def run_prewarm_loop() -> None:
+    """
+    一定間隔でプリウォームを繰り返します。アプリケーションのlifespanからタスクとして起動されます。
+    マルチワーカー構成では、ロックを取れたワーカーだけが実行します。
+    """
+    while True:
+        try:
+            if not await run_in_threadpool(try_become_leader):
+                logger.debug("Another worker is prewarming Rakuten recipes")
+            else:
+                await prewarm_rakuten_recipes()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[ERROR] Rakuten prewarm failed: {e}")
+        await asyncio.sleep(settings.RAKUTEN_PREWARM_INTERVAL_SECONDS)
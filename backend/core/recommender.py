@@ -1,61 +1,137 @@
 # backend/core/recommender.py
-from sklearn.feature_extraction.text import TfidfVectorizer #"textをTF=IDベクトルに変えるためのライブラリ"
-from sklearn.metrics.pairwise import cosine_similarity #コサイン類似度を計算する関数
-from janome.tokenizer import Tokenizer #日本語の形態素解析ライブらり
+# scikit-learn / NumPy / Janome は重いので、実際に推薦を計算するときまで読み込まない
+import logging
+import threading
+
 from sqlalchemy.orm import Session #Db接続を持つsession 
-import numpy as np #numpy
 
 import crud #自作のモジュール　dbのcrudまとめ
 import db_models as models #自作のdbモデル定義
+from core.catalog import catalog, CatalogSnapshot
+from core.collaborative import cooccurrence
+from core.config import settings
+from core.favorites import favorite_writer
+
+logger = logging.getLogger(__name__)
+
+# Janome tokenizer (IPADIC辞書を読み込むので初回利用時に生成する)
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
 
-# Janome tokenizerの初期化
-t = Tokenizer()
+def get_tokenizer():
+    """Janome の Tokenizer を返します。初回呼び出し時に辞書を読み込みます。"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                from janome.tokenizer import Tokenizer #日本語の形態素解析ライブらり
+                _tokenizer = Tokenizer()
+    return _tokenizer
+
+def warm_up() -> None:
+    """
+    推薦に使う重いモジュールと辞書を先に読み込んでおきます。
+    lifespan からバックグラウンドスレッドで呼ばれる想定です。
+    """
+    try:
+        import numpy  # noqa: F401
+        import sklearn.feature_extraction.text  # noqa: F401
+        import sklearn.metrics.pairwise  # noqa: F401
+        get_tokenizer().tokenize("ウォームアップ")
+        logger.info("Recommender warm-up finished")
+    except Exception as e:
+        logger.error(f"[ERROR] Recommender warm-up failed: {e}")
 
 def tokenize(text: str) -> list[str]:
     """日本語のテキストを単語（名詞、動詞、形容詞の原型）に分割する"""
-    return [token.base_form for token in t.tokenize(text) 
+    return [token.base_form for token in get_tokenizer().tokenize(text) 
             if token.part_of_speech.split(',')[0] in ['名詞', '動詞', '形容詞']]
 
+# カタログの行と揃えたTF-IDF行列 (行番号 = カタログの行番号)
+# 記事が増えたときは既存の語彙で追加分だけ変換し、増えた割合が REFIT_RATIO を超えたら学習し直す
+REFIT_RATIO = 0.2
+_vectorizer = None
+_matrix = None
+_matrix_generation = -1
+_matrix_fit_rows = 0
+_matrix_lock = threading.Lock()
+
+def _corpus(db: Session, article_ids) -> list[str]:
+    texts = {row.id: (row.title or '') + ' ' + (row.summary or '') for row in crud.get_article_texts(db, list(article_ids))}
+    return [texts.get(article_id, '') for article_id in article_ids]
+
+def _article_vectors(db: Session, snapshot: CatalogSnapshot):
+    """snapshot の行と揃ったTF-IDF行列を返す。必要な分だけ学習・変換する"""
+    from sklearn.feature_extraction.text import TfidfVectorizer #"textをTF=IDベクトルに変えるためのライブラリ"
+    from scipy.sparse import vstack
+
+    global _vectorizer, _matrix, _matrix_generation, _matrix_fit_rows
+    num_rows = len(snapshot.ids)
+    with _matrix_lock:
+        if _matrix_generation == snapshot.generation and _matrix.shape[0] >= num_rows:
+            return _matrix[:num_rows]
+
+        added = num_rows - (_matrix.shape[0] if _matrix is not None else 0)
+        if _matrix_generation != snapshot.generation or added > _matrix_fit_rows * REFIT_RATIO:
+            # TF-IDFベクトル化 (カタログ全体で学習し直す)
+            _vectorizer = TfidfVectorizer(tokenizer=tokenize)
+            _matrix = _vectorizer.fit_transform(_corpus(db, snapshot.ids))
+            _matrix_generation = snapshot.generation
+            _matrix_fit_rows = num_rows
+        else:
+            # 追加された記事だけ既存の語彙で変換して行を足す
+            new_ids = snapshot.ids[_matrix.shape[0]:]
+            _matrix = vstack([_matrix, _vectorizer.transform(_corpus(db, new_ids))]).tocsr()
+        return _matrix[:num_rows]
+
 def generate_recommendations(db: Session, user: models.User, top_n=10) -> list[models.Article]:
     """ユーザーのお気に入りに基づいて記事を推薦する"""
-    favorite_articles = crud.get_favorite_articles(db, user=user)
-    all_articles = crud.get_all_articles(db)
+    from sklearn.metrics.pairwise import cosine_similarity #コサイン類似度を計算する関数
+    import numpy as np #numpy
+
+    # ユーザーがお気に入りにした記事のIDセット (ORMオブジェクトは作らない、未書き込みの操作も含む)
+    favorite_ids = favorite_writer.favorite_ids(db, user_id=user.id)
+    if not favorite_ids:
+        return []
 
-    if not favorite_articles or not all_articles:
+    catalog.ensure_loaded(db)
+    snapshot = catalog.snapshot()
+    if not snapshot.ids:
         return []
 
-    # ユーザーがお気に入りにした記事のIDセット
-    favorite_ids = {article.id for article in favorite_articles}
+    ids = np.frombuffer(snapshot.ids, dtype=np.int64)
+    alive = np.frombuffer(snapshot.alive, dtype=np.uint8).astype(bool)
+    is_favorite = np.isin(ids, favorite_ids) & alive
 
     # 推薦候補の記事（お気に入り以外）
-    candidate_articles = [article for article in all_articles if article.id not in favorite_ids]
-    if not candidate_articles:
+    candidates = alive & ~is_favorite
+    if not is_favorite.any() or not candidates.any():
         return []
 
-    # コーパス（記事のテキスト集）を作成
-    # 候補記事 + お気に入り記事 の順
-    corpus = [(a.title or '') + ' ' + (a.summary or '') for a in candidate_articles + favorite_articles]
-    
-    # TF-IDFベクトル化
-    vectorizer = TfidfVectorizer(tokenizer=tokenize)
-    tfidf_matrix = vectorizer.fit_transform(corpus)
+    tfidf_matrix = _article_vectors(db, snapshot)
 
     # お気に入り記事のベクトルを平均してユーザープロファイルを作成
-    num_candidates = len(candidate_articles)
-    favorite_vectors = tfidf_matrix[num_candidates:]
-    user_profile = np.mean(favorite_vectors, axis=0)
-    user_profile = np.asarray(user_profile) # Convert from np.matrix to np.ndarray
+    user_profile = np.asarray(tfidf_matrix[np.flatnonzero(is_favorite)].mean(axis=0)) # Convert from np.matrix to np.ndarray
 
-    # 候補記事のベクトル
-    candidate_vectors = tfidf_matrix[:num_candidates]
+    # コサイン類似度を計算 (候補以外は選ばれないようにする)
+    similarities = cosine_similarity(user_profile, tfidf_matrix)[0]
 
-    # コサイン類似度を計算
-    similarities = cosine_similarity(user_profile, candidate_vectors)
+    # 協調フィルタリング (他のユーザーのお気に入りとの共起) のスコアを混ぜる
+    # 共起行列はバックグラウンドで作るので、まだできていなければTF-IDFだけで推薦する
+    cf_weight = settings.CF_BLEND_WEIGHT
+    if cf_weight > 0:
+        cf_scores = cooccurrence.scores(favorite_ids)
+        if cf_scores:
+            cf = np.fromiter((cf_scores.get(article_id, 0.0) for article_id in snapshot.ids), dtype=np.float64, count=len(ids))
+            # スコアの付いた記事がカタログに1件も無ければ (削除済みなど) 混ぜない
+            cf_max = cf.max()
+            if cf_max > 0:
+                similarities = (1 - cf_weight) * similarities + cf_weight * cf / cf_max
 
-    # 類似度が高い順にソートし、インデックスを取得
-    sorted_indices = np.argsort(similarities[0])[::-1]
+    similarities[~candidates] = -np.inf
 
-    # 上位N件の記事を返す
-    recommended_articles = [candidate_articles[i] for i in sorted_indices[:top_n]]
+    # 類似度が高い順にソートし、上位N件の記事IDを取得
+    sorted_rows = np.argsort(similarities)[::-1][:min(top_n, int(candidates.sum()))]
 
-    return recommended_articles
+    # 上位N件の記事だけをDBから読み込んで返す
+    return crud.get_articles_by_ids(db, [int(ids[row]) for row in sorted_rows])
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 
 import db_models as models # 追加
 import schemas
-from core.db import get_db
+from core.db import get_db, SessionLocal
 
 # --- Configuration ---
 SECRET_KEY = "a_very_secret_key_that_should_be_in_env_vars"  # 本番環境では環境変数から読み込むべき
@@ -62,3 +62,15 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if user is None:
         raise credentials_exception
     return user
+
+def get_current_user_detached(token: str = Depends(oauth2_scheme)):
+    """
+    get_current_user と同じ認証を、すぐに閉じるセッションで行います。
+    返すユーザーはセッションから切り離されているので、読み込み済みの列 (id, email など) だけを使えます。
+    応答までに長く待つエンドポイントで、リクエストの間ずっとDB接続を持たないようにするために使います。
+    """
+    db = SessionLocal()
+    try:
+        return get_current_user(token=token, db=db)
+    finally:
+        db.close()
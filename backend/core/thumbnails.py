@@ -0,0 +1,271 @@
+# backend/core/thumbnails.py
+# サムネイル画像のプロキシ: 外部の画像を取得して決まったサイズに縮小し、内容のハッシュをキーにディスクへキャッシュする。
+#
+# キャッシュの構成 (THUMBNAIL_CACHE_DIR 以下):
+#   objects/<hash[:2]>/<hash>.webp   縮小済み画像。ファイル名は画像の中身の sha256 (同じ画像は1つにまとまる)
+#   refs/<sha256(元URL)>-<size>      元URLとサイズから objects のハッシュを引くための小さなファイル
+# objects の合計が THUMBNAIL_CACHE_MAX_BYTES を超えたら、最後に使われた時刻 (mtime) が古いものから消し、
+# 消えた objects を指している refs も片付ける。
+# 縮小済みの画像は小さいので、読み出した中身をメモリに載せて返す (返す前に他のワーカーが消しても困らないように)。
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from core import events
+from core.config import settings
+from scraper import get_http_client
+
+logger = logging.getLogger(__name__)
+
+# 長辺の最大ピクセル数
+SIZES = {"small": 96, "medium": 240, "large": 480}
+PREFETCH_SIZE = "medium"
+MEDIA_TYPE = "image/webp"
+
+# 取得する元画像の上限 (これより大きい画像は扱わない)
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# 上限を超えたときに、ここまで減らす
+EVICT_TARGET_RATIO = 0.9
+
+
+class Thumbnail(NamedTuple):
+    content_hash: str
+    data: bytes
+
+
+class ThumbnailCache:
+    """ディスク上のコンテンツアドレス型キャッシュ。メソッドはすべて同期処理 (スレッドから呼ぶ)"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    def _ref_path(self, url: str, size: str) -> str:
+        return os.path.join(self.root, "refs", f"{hashlib.sha256(url.encode()).hexdigest()}-{size}")
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash[:2], f"{content_hash}.webp")
+
+    def get(self, url: str, size: str) -> Optional[Thumbnail]:
+        try:
+            with open(self._ref_path(url, size)) as f:
+                content_hash = f.read().strip()
+            path = self._object_path(content_hash)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path) # LRU用に最終利用時刻を更新
+        except OSError:
+            return None # 画像が消されていたら取得し直す
+        return Thumbnail(content_hash, data)
+
+    def put(self, url: str, size: str, data: bytes) -> Thumbnail:
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._object_path(content_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        added = 0
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            added = len(data)
+
+        ref_path = self._ref_path(url, size)
+        os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+        tmp_ref = f"{ref_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_ref, "w") as f:
+            f.write(content_hash)
+        os.replace(tmp_ref, ref_path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += added
+            if self._total_bytes > self.max_bytes:
+                self._evict(keep=path)
+        return Thumbnail(content_hash, data)
+
+    def _objects(self):
+        objects_dir = os.path.join(self.root, "objects")
+        for dirpath, _, filenames in os.walk(objects_dir):
+            for filename in filenames:
+                if filename.endswith(".webp"):
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_total(self) -> int:
+        return sum(size for _, size, _ in self._objects())
+
+    def _evict(self, keep: Optional[str] = None):
+        """最後に使われたのが古い画像から消す (keep は今書いたばかりの画像なので消さない)"""
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        total = self._scan_total() # 他のワーカーが書いた分も含めて数え直す
+        removed = 0
+        for _, size, path in sorted(self._objects()):
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+        if removed:
+            self._prune_refs()
+
+    def _prune_refs(self):
+        """画像が無くなった refs を消す (他のワーカーが消した画像の分も含む)"""
+        refs_dir = os.path.join(self.root, "refs")
+        try:
+            names = os.listdir(refs_dir)
+        except OSError:
+            return
+        for name in names:
+            ref_path = os.path.join(refs_dir, name)
+            try:
+                if name.endswith(".tmp"):
+                    continue # 書き込み中
+                with open(ref_path) as f:
+                    content_hash = f.read().strip()
+                if not os.path.exists(self._object_path(content_hash)):
+                    os.remove(ref_path)
+            except OSError:
+                pass
+
+
+def resize(data: bytes, size: str) -> bytes:
+    """画像を長辺 SIZES[size] ピクセル以内に縮小して WebP にする"""
+    from PIL import Image
+
+    max_side = SIZES[size]
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (max_side, max_side)) # JPEGはデコード時点で縮小して速くする
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((max_side, max_side))
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=80, method=4)
+        return output.getvalue()
+
+
+cache = ThumbnailCache(settings.THUMBNAIL_CACHE_DIR, settings.THUMBNAIL_CACHE_MAX_BYTES)
+# 同じ画像への同時リクエストは1回の取得にまとめる
+_in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+
+async def _fetch_and_store(url: str, size: str) -> Thumbnail:
+    client = get_http_client()
+    async with client.stream("GET", url, headers={'User-Agent': 'Mozilla/5.0'}, follow_redirects=True) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+        if not content_type.startswith("image/"):
+            raise ValueError(f"Not an image: {content_type}")
+        chunks, received = [], 0
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            if received > MAX_SOURCE_BYTES:
+                raise ValueError("Image too large")
+            chunks.append(chunk)
+    data = await run_in_threadpool(resize, b"".join(chunks), size)
+    return await run_in_threadpool(cache.put, url, size, data)
+
+
+async def get_thumbnail(url: str, size: str) -> Thumbnail:
+    """
+    キャッシュにあればそれを、なければ取得・縮小して保存したものを返す。
+    取得や縮小に失敗したときは例外をそのまま投げる。
+    """
+    cached = await run_in_threadpool(cache.get, url, size)
+    if cached is not None:
+        return cached
+
+    key = (url, size)
+    future = _in_flight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        thumbnail = await _fetch_and_store(url, size)
+        future.set_result(thumbnail)
+        return thumbnail
+    except Exception as e:
+        future.set_exception(e)
+        future.exception() # 待っている人がいなくても "never retrieved" の警告を出さない
+        raise
+    finally:
+        if not future.done():
+            future.cancel() # キャンセルされたときも待っている側を解放する
+        del _in_flight[key]
+
+
+# --- 取り込み時の先読み ---
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_prefetch_semaphore: Optional[asyncio.Semaphore] = None
+_prefetch_tasks: set[asyncio.Task] = set()
+
+
+async def prefetch(urls: Iterable[str], size: str = PREFETCH_SIZE) -> None:
+    """サムネイルをバックグラウンドで取得してキャッシュしておく。失敗は無視する"""
+    async def one(url: str):
+        async with _prefetch_semaphore:
+            try:
+                await get_thumbnail(url, size)
+            except Exception as e:
+                logger.debug(f"Thumbnail prefetch failed for {url}: {e}")
+
+    started = time.perf_counter()
+    urls = list(dict.fromkeys(urls))
+    await asyncio.gather(*(one(url) for url in urls))
+    logger.debug(f"Prefetched {len(urls)} thumbnails in {time.perf_counter() - started:.1f}s")
+
+
+def _on_articles_upserted(rows) -> None:
+    """保存された記事のサムネイルを先読みする (どのスレッドから呼ばれてもよい)"""
+    if _loop is None:
+        return
+    urls = [row.thumbnail_url for row in rows if getattr(row, "thumbnail_url", None)]
+    if urls:
+        _loop.call_soon_threadsafe(_schedule_prefetch, urls)
+
+
+def _schedule_prefetch(urls: list[str]) -> None:
+    task = asyncio.get_running_loop().create_task(prefetch(urls))
+    # 実行中のタスクがGCされないように参照を持っておく
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_tasks.discard)
+
+
+def start_prefetcher() -> None:
+    """lifespan から呼ばれる。以降、記事の保存イベントでサムネイルを先読みする"""
+    global _loop, _prefetch_semaphore
+    _loop = asyncio.get_running_loop()
+    _prefetch_semaphore = asyncio.Semaphore(settings.THUMBNAIL_PREFETCH_CONCURRENCY)
+
+
+async def stop_prefetcher() -> None:
+    global _loop
+    _loop = None
+    for task in list(_prefetch_tasks):
+        task.cancel()
+    await asyncio.gather(*_prefetch_tasks, return_exceptions=True)
+
+
+events.subscribe(events.ARTICLES_UPSERTED, _on_articles_upserted)
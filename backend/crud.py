@@ -1,7 +1,13 @@
 # backend/crud.py
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List
+from sqlalchemy import bindparam, delete, or_, select, tuple_, update
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import db_models as models
 import schemas
+from core import events
 from core.security import get_password_hash
 
 # --- User CRUD ---
@@ -13,6 +19,11 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+def _upsert_insert(db: Session, table):
+    """INSERT ... ON CONFLICT for the bound dialect (Postgres in production, SQLite for local scripts)."""
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    return insert(table)
+
 # --- Article CRUD ---
 def get_article(db: Session, article_id: int):
     return db.query(models.Article).filter(models.Article.id == article_id).first()
@@ -20,41 +31,223 @@ def get_article(db: Session, article_id: int):
 def get_article_by_url(db: Session, url: str):
     return db.query(models.Article).filter(models.Article.url == url).first()
 
+def get_existing_article_ids(db: Session, article_ids: List[int]) -> List[int]:
+    return [row.id for row in db.query(models.Article.id).filter(models.Article.id.in_(article_ids)).all()]
+
+def article_exists(db: Session, article_id: int) -> bool:
+    return db.query(models.Article.id).filter(models.Article.id == article_id).first() is not None
+
+def get_article_thumbnail_url(db: Session, article_id: int):
+    return db.query(models.Article.thumbnail_url).filter(models.Article.id == article_id).scalar()
+
+def get_articles_by_urls(db: Session, urls: Iterable[str]):
+    return db.query(models.Article).filter(models.Article.url.in_(list(urls))).all()
+
+def get_articles_by_ids(db: Session, article_ids: List[int]):
+    """Returns the articles for the given ids, in the order of article_ids."""
+    articles = {a.id: a for a in db.query(models.Article).filter(models.Article.id.in_(article_ids)).all()}
+    return [articles[article_id] for article_id in article_ids if article_id in articles]
+
+def get_catalog_rows(db: Session):
+    """Returns (id, url, published_date, source) tuples for every article, without building ORM objects."""
+    return db.query(
+        models.Article.id, models.Article.url, models.Article.published_date, models.Article.source
+    ).all()
+
+def get_article_texts(db: Session, article_ids: List[int]):
+    """Returns (id, title, summary) tuples for the given ids."""
+    return db.query(models.Article.id, models.Article.title, models.Article.summary).filter(
+        models.Article.id.in_(article_ids)
+    ).all()
+
 def get_all_articles(db: Session, skip: int = 0, limit: int = 1000):
     return db.query(models.Article).order_by(models.Article.published_date.desc()).offset(skip).limit(limit).all()
 
+def get_articles_by_category(db: Session, source: str, category_id: str, limit: int = 100):
+    """
+    取得元とカテゴリIDで記事を取得します。(source, category_id) の複合インデックスを使います。
+    楽天レシピはランキングの順位順に返します。
+    """
+    return (
+        db.query(models.Article)
+        .filter(models.Article.source == source, models.Article.category_id == category_id)
+        .order_by(models.Article.category_rank.asc().nulls_last(), models.Article.published_date.desc())
+        .limit(limit)
+        .all()
+    )
+
 def create_article(db: Session, article: schemas.ArticleCreate) -> models.Article:
     db_article = models.Article(**article.model_dump())
     db.add(db_article)
     db.commit()
     db.refresh(db_article)
+    events.publish(events.ARTICLES_UPSERTED, [db_article])
     return db_article
 
-def cull_old_articles(db: Session, max_count: int = 200):
+def bulk_upsert_articles(db: Session, articles: List[schemas.ArticleCreate]) -> int:
+    """
+    Inserts articles in a single multi-row statement, updating rows whose URL already exists.
+    The sentiment column is left untouched on conflict. Returns the number of rows sent.
+    """
+    # ON CONFLICT DO UPDATE cannot touch the same row twice in one statement, so dedupe by URL.
+    rows = list({article.url: article.model_dump() for article in articles if article.url}.values())
+    if not rows:
+        return 0
+    stmt = _upsert_insert(db, models.Article).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Article.url],
+        set_={
+            "title": stmt.excluded.title,
+            "published_date": stmt.excluded.published_date,
+            "summary": stmt.excluded.summary,
+            "thumbnail_url": stmt.excluded.thumbnail_url,
+            "source": stmt.excluded.source,
+            "category_id": stmt.excluded.category_id,
+            "category_rank": stmt.excluded.category_rank,
+        },
+    )
+    stored = db.execute(
+        stmt.returning(
+            models.Article.id, models.Article.url, models.Article.published_date, models.Article.source,
+            models.Article.thumbnail_url,
+        )
+    ).all()
+    db.commit()
+    events.publish(events.ARTICLES_UPSERTED, stored)
+    return len(rows)
+
+def cull_old_articles(db: Session, max_count: int = 200, sources: Iterable[str] = ()):
     """
     Keeps the number of articles at max_count by deleting the oldest ones.
+    If sources is given, only articles from those sources are counted and culled.
     """
-    article_count = db.query(models.Article).count()
+    query = db.query(models.Article)
+    sources = list(sources)
+    if sources:
+        query = query.filter(models.Article.source.in_(sources))
+    article_count = query.count()
     if article_count > max_count:
         num_to_delete = article_count - max_count
-        oldest_articles = db.query(models.Article).order_by(models.Article.published_date.asc()).limit(num_to_delete).all()
+        oldest_articles = query.order_by(models.Article.published_date.asc()).limit(num_to_delete).all()
+        deleted_ids = [article.id for article in oldest_articles]
         for article in oldest_articles:
             db.delete(article)
         db.commit()
+        events.publish(events.ARTICLES_DELETED, deleted_ids)
+
+def retire_stale_category_articles(db: Session, source: str, current_urls: Dict[str, List[str]]) -> int:
+    """
+    For each category_id in current_urls, retires the articles of that source and category whose URL is no longer listed
+    (e.g. recipes that dropped out of a ranking). Favorited articles are kept but detached from the category
+    (category_id = NULL) so they disappear from the category page without breaking favorites.
+    Returns the number of deleted articles.
+    """
+    article = models.Article
+    favorited = (
+        select(models.favorite_table.c.article_id).where(models.favorite_table.c.article_id == article.id).exists()
+    )
+    deleted_ids = []
+    for category_id, urls in current_urls.items():
+        stale = (article.source == source, article.category_id == category_id, article.url.notin_(urls))
+        deleted_ids += db.execute(delete(article).where(*stale, ~favorited).returning(article.id)).scalars().all()
+        db.execute(update(article).where(*stale, favorited).values(category_id=None, category_rank=None).execution_options(synchronize_session=False))
+    db.commit()
+    if deleted_ids:
+        events.publish(events.ARTICLES_DELETED, deleted_ids)
+    return len(deleted_ids)
+
+# --- Enrichment ---
+def claim_unenriched_articles(db: Session, limit: int = 64, claim_timeout_seconds: int = 300):
+    """
+    Marks up to limit unenriched articles as claimed and returns their (id, title, summary) tuples.
+    Articles claimed by another worker within claim_timeout_seconds are skipped.
+    The row locks (FOR UPDATE SKIP LOCKED) are only held by this short transaction, which is committed here,
+    so the analysis itself runs without blocking upserts or deletes of the same rows.
+    """
+    now = datetime.now(timezone.utc)
+    claimable = (
+        select(models.Article.id)
+        .where(
+            models.Article.enriched_at.is_(None),
+            or_(
+                models.Article.enrichment_claimed_at.is_(None),
+                models.Article.enrichment_claimed_at < now - timedelta(seconds=claim_timeout_seconds),
+            ),
+        )
+        .order_by(models.Article.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(models.Article)
+        .where(models.Article.id.in_(claimable))
+        .values(enrichment_claimed_at=now)
+        .returning(models.Article.id, models.Article.title, models.Article.summary)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(rows, key=lambda row: row.id)
+
+def save_enrichment(db: Session, results: List[dict]) -> int:
+    """
+    Writes sentiment, sentiment_score and keywords and marks the rows as enriched.
+    Rows that were enriched meanwhile (or deleted) are left untouched. Returns the number of rows written.
+    """
+    if not results:
+        return 0
+    # SET の列は各行のパラメータ名から決まる (id は WHERE 用に article_id として渡す)
+    table = models.Article.__table__
+    stmt = update(table).where(table.c.id == bindparam("article_id"), table.c.enriched_at.is_(None))
+    now = datetime.now(timezone.utc)
+    result = db.execute(stmt, [
+        {"article_id": r["id"], "sentiment": r["sentiment"], "sentiment_score": r["sentiment_score"],
+         "keywords": r["keywords"], "enriched_at": now}
+        for r in results
+    ])
+    db.commit()
+    return result.rowcount
 
 # --- Favorite CRUD ---
 def favorite_article(db: Session, user: models.User, article: models.Article):
     if article not in user.favorite_articles:
         user.favorite_articles.append(article)
         db.commit()
+        events.publish(events.FAVORITE_ADDED, (user.id, article.id))
     return user
 
 def unfavorite_article(db: Session, user: models.User, article: models.Article):
     if article in user.favorite_articles:
         user.favorite_articles.remove(article)
         db.commit()
+        events.publish(events.FAVORITE_REMOVED, (user.id, article.id))
     return user
 
 def get_favorite_articles(db: Session, user: models.User):
     return user.favorite_articles
 
+def apply_favorite_changes(db: Session, adds: List[tuple], removes: List[tuple]):
+    """
+    Writes a batch of favorite changes in one transaction: one multi-row INSERT ... ON CONFLICT DO NOTHING
+    for adds and one DELETE for removes. Returns the (user_id, article_id) pairs that actually changed.
+    """
+    table = models.favorite_table
+    added, removed = [], []
+    if adds:
+        stmt = _upsert_insert(db, table).values([{"user_id": u, "article_id": a} for u, a in adds])
+        stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.article_id])
+        added = db.execute(stmt.returning(table.c.user_id, table.c.article_id)).all()
+    if removes:
+        stmt = delete(table).where(tuple_(table.c.user_id, table.c.article_id).in_(removes))
+        removed = db.execute(stmt.returning(table.c.user_id, table.c.article_id)).all()
+    db.commit()
+    return added, removed
+
+def get_all_favorites(db: Session):
+    """Returns every (user_id, article_id) pair of the favorites table."""
+    return db.query(models.favorite_table.c.user_id, models.favorite_table.c.article_id).all()
+
+def get_favorite_article_ids(db: Session, user_id: int) -> List[int]:
+    """Reads the favorited article ids straight from the association table."""
+    rows = db.query(models.favorite_table.c.article_id).filter(models.favorite_table.c.user_id == user_id).all()
+    return [row.article_id for row in rows]
+
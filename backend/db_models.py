@@ -1,5 +1,5 @@
 # backend/db_models.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Table, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Table, DateTime, Index, Float, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from core.db import Base
@@ -32,7 +32,21 @@ class Article(Base):
     summary = Column(Text)
     thumbnail_url = Column(String)
     sentiment = Column(String, default="neutral")
+    sentiment_score = Column(Float) # 感情辞書によるスコア (正: ポジティブ, 負: ネガティブ)
+    keywords = Column(JSON) # TF-IDFの上位語のリスト
+    enriched_at = Column(DateTime(timezone=True)) # 感情・キーワードを付けた日時 (NULL は未処理)
+    enrichment_claimed_at = Column(DateTime(timezone=True)) # バッチ処理が記事を確保した日時 (処理中の記事を他のワーカーが取らないように)
+    source = Column(String) # 取得元 ("zenn", "qiita", "rakuten")
+    category_id = Column(String) # 楽天レシピのカテゴリID (例: "27-266")
+    category_rank = Column(Integer) # カテゴリ別ランキングでの順位 (1始まり)。カテゴリページはこの順に並べる
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     favorited_by = relationship("User", secondary=favorite_table, back_populates="favorite_articles")
+
+    # カテゴリページはこのインデックスだけで引けるようにする
+    __table_args__ = (
+        Index("ix_articles_source_category_id", "source", "category_id"),
+        # 未処理の記事だけを引く部分インデックス
+        Index("ix_articles_unenriched", "id", postgresql_where=enriched_at.is_(None)),
+    )
@@ -0,0 +1,30 @@
+# backend/gunicorn.conf.py
+# 本番用のマルチワーカー構成: gunicorn -c gunicorn.conf.py main:app
+#
+# preload_app でアプリと重いモジュール (scikit-learn, Janome辞書) を fork 前に親プロセスで読み込み、
+# 読み取り専用のメモリを copy-on-write で全ワーカーから共有する。
+import gc
+
+from core.config import settings
+
+bind = "0.0.0.0:8001"
+workers = settings.WEB_CONCURRENCY
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+
+
+def when_ready(server):
+    """fork 前 (アプリ読み込み後) に親プロセスで一度だけ呼ばれる"""
+    from core import recommender
+
+    recommender.warm_up()
+    # 共有したオブジェクトを GC の対象外にして、参照カウント以外でページが複製されないようにする
+    gc.freeze()
+    server.log.info(f"Preloaded recommender state, starting {workers} workers")
+
+
+def post_fork(server, worker):
+    """各ワーカーで fork 直後に呼ばれる。親から引き継いだ接続プールは使わずに作り直す"""
+    from core.db import engine
+
+    engine.dispose(close=False)
@@ -1,31 +1,62 @@
 # -*- coding: utf-8 -*-
 import logging
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, Depends
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response
-from typing import List
 import asyncio
-import requests
 
 # scraper.pyから実際のスクレイピング関数をインポート (一時的にコメントアウト)
 # from scraper import scrape_programming_news
-# models.pyから共有データモデルをインポート
-import schemas
-from core.security import get_current_user
+from core.config import settings
+from core import recommender
+from core.prewarm import run_prewarm_loop
+from core import enrichment
+from core.collaborative import run_refresh_loop as run_cooccurrence_refresh_loop
+from core.favorites import favorite_writer
+from core import thumbnails as thumbnail_cache
+from scraper import close_http_client
 
 # Import the new auth router
-from api import auth, articles, categories
+from api import auth, articles, categories, thumbnails
 
 # ロギング設定 ーーー→開発や運用において、プログラムの動作状況やエラーを記録すためのもの
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# --- Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 起動時: お気に入り操作のまとめ書きと、楽天レシピのプリウォームをバックグラウンドで開始
+    background_tasks = [asyncio.create_task(favorite_writer.run())]
+    if settings.RAKUTEN_PREWARM_ENABLED:
+        background_tasks.append(asyncio.create_task(run_prewarm_loop()))
+    # 感情・キーワードの付与はリクエストとは別にバックグラウンドで行う
+    if settings.ENRICHMENT_ENABLED:
+        background_tasks.append(asyncio.create_task(enrichment.run_enrichment_loop()))
+    # 協調フィルタリングの共起行列はリクエストの外で作り、定期的に作り直す
+    if settings.CF_BLEND_WEIGHT > 0:
+        background_tasks.append(asyncio.create_task(run_cooccurrence_refresh_loop()))
+    # 記事の保存時にサムネイルを先読みする
+    if settings.THUMBNAIL_PREFETCH_ENABLED:
+        thumbnail_cache.start_prefetcher()
+    # 推薦モジュールの読み込みは起動をブロックしないようにスレッドで行う
+    if settings.RECOMMENDER_WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, recommender.warm_up)
+    yield
+    # 終了時: バックグラウンドタスクを止めて共有HTTPクライアントを閉じる
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await thumbnail_cache.stop_prefetcher()
+    await close_http_client()
+
 # --- FastAPI Application ---
 app = FastAPI(
     title="News Curation API",
     description="指定されたサイトから記事を収集し、感情分析（またはキーワード抽出）を行うAPIです。",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # --- CORS Middleware (FastAPIの標準ミドルウェアを使用) ---
@@ -43,8 +74,17 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(articles.router, prefix="/api/articles", tags=["Articles"])
 app.include_router(categories.router, prefix="/api/categories", tags=["Categories"])
+app.include_router(thumbnails.router, prefix="/api/thumbnails", tags=["Thumbnails"])
 
 # --- API Endpoints ---
 @app.get("/", tags=["General"])
 def read_root():
     return {"message": "Welcome to the News Curation API!"}
+
+@app.get("/metrics/enrichment", tags=["General"])
+def read_enrichment_metrics():
+    return enrichment.metrics
+
+@app.get("/metrics/favorites", tags=["General"])
+def read_favorite_metrics():
+    return favorite_writer.metrics
@@ -16,6 +16,9 @@ class Article(BaseModel):
     summary: Optional[str] = None
     thumbnail_url: Optional[str] = None
     sentiment: Optional[str] = "neutral"
+    source: Optional[str] = None
+    category_id: Optional[str] = None
+    category_rank: Optional[int] = None # カテゴリ別ランキングでの順位 (1始まり)
 
 class RecipeCategory(BaseModel):
     """
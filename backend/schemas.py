@@ -1,6 +1,6 @@
 # backend/schemas.py
 #APIでデータをやり取りする際の型定義
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, computed_field
 from typing import Optional, List
 
 # --- Token Schemas ---
@@ -19,14 +19,25 @@ class ArticleBase(BaseModel):
     summary: Optional[str] = None
     thumbnail_url: Optional[str] = None
     sentiment: Optional[str] = "neutral"
+    source: Optional[str] = None
+    category_id: Optional[str] = None
+    category_rank: Optional[int] = None
 
 class ArticleCreate(ArticleBase):
     pass
 
 class Article(ArticleBase):
     id: int
+    sentiment_score: Optional[float] = None
+    keywords: Optional[List[str]] = None
     model_config = ConfigDict(from_attributes=True)
 
+    @computed_field
+    @property
+    def thumbnail_proxy_url(self) -> Optional[str]:
+        """縮小・キャッシュ済みのサムネイルのパス (GET /api/thumbnails/{id})"""
+        return f"/api/thumbnails/{self.id}?size=medium" if self.thumbnail_url else None
+
 # --- User Schemas ---
 class UserBase(BaseModel):
     email: str
@@ -4,10 +4,8 @@
 import httpx
 from bs4 import BeautifulSoup
 import json
-from typing import List
+from typing import List, Optional
 import logging
-import feedparser
-import asyncio
 
 from models import Article, RecipeCategory
 from core.config import settings
@@ -16,6 +14,32 @@ from core.config import settings
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# 取得元の識別子 (articles.source に保存される)
+SOURCE_ZENN = "zenn"
+SOURCE_QIITA = "qiita"
+SOURCE_RAKUTEN = "rakuten"
+
+# 全スクレイパーで共有するHTTPクライアント (接続プールを使い回す)
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    共有の非同期HTTPクライアントを返します。初回呼び出し時に作成されます。
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=10.0)
+    return _http_client
+
+async def close_http_client() -> None:
+    """
+    共有HTTPクライアントを閉じます。アプリケーション終了時に呼び出します。
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 async def get_rakuten_recipes(category_id: str) -> List[Article]:
     """
     楽天レシピカテゴリ別ランキングAPIからレシピ情報を取得します。
@@ -26,21 +50,24 @@ async def get_rakuten_recipes(category_id: str) -> List[Article]:
     url = f"https://app.rakuten.co.jp/services/api/Recipe/CategoryRanking/20170426?applicationId={app_id}&categoryId={category_id}"
     articles = []
     try:
-        async with httpx.AsyncClient() as client:#非同期通信HTTPクライアントを作成ーーー→処理が終了と同時にクライアントが自動的に閉じられます
-            response = await client.get(url, timeout=10.0)
-            response.raise_for_status() #HTTPエラーが発生した場合に例外をスローする
-            data = response.json() #JSONで返す
+        client = get_http_client() #共有の非同期HTTPクライアント (接続を使い回す)
+        response = await client.get(url, timeout=10.0)
+        response.raise_for_status() #HTTPエラーが発生した場合に例外をスローする
+        data = response.json() #JSONで返す
 
         logger.debug(f"Successfully fetched {len(data['result'])} recipes from Rakuten API.")
 
-        for item in data['result']:
+        for rank, item in enumerate(data['result'], start=1): # ランキング順に返ってくる
             article = Article(
                 title=item.get('recipeTitle', 'No Title'),
                 url=item.get('recipeUrl'),
                 published_date=item.get('updateTime'),
                 summary=item.get('recipeDescription'),
                 thumbnail_url=item.get('foodImageUrl'),
-                sentiment='neutral'
+                sentiment='neutral',
+                source=SOURCE_RAKUTEN,
+                category_id=category_id,
+                category_rank=rank
             )
             articles.append(article)
 
@@ -58,9 +85,9 @@ async def scrape_zenn_news() -> List[Article]:
     url = "https://zenn.dev/articles"
     articles = []
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10.0) #ブラウザからのアクセスに見せかけることで、ブロックを回避する一般的なテクニック
-            response.raise_for_status()
+        client = get_http_client()
+        response = await client.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10.0) #ブラウザからのアクセスに見せかけることで、ブロックを回避する一般的なテクニック
+        response.raise_for_status()
 
         soup = BeautifulSoup(response.text, 'html.parser')
         next_data_script = soup.find('script', {'id': '__NEXT_DATA__'})
@@ -79,7 +106,8 @@ async def scrape_zenn_news() -> List[Article]:
                 published_date=item.get('publishedAt'),
                 summary=None,
                 thumbnail_url=item.get('user', {}).get('avatarSmallUrl'),
-                sentiment='neutral'
+                sentiment='neutral',
+                source=SOURCE_ZENN
             )
             articles.append(article)
 
@@ -97,9 +125,9 @@ async def scrape_qiita_news() -> List[Article]:
     url = "https://qiita.com/"
     articles = []
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10.0)#ブラウザからのアクセスに見せかけることで、ブロックを回避する一般的なテクニック
-            response.raise_for_status()
+        client = get_http_client()
+        response = await client.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=10.0)#ブラウザからのアクセスに見せかけることで、ブロックを回避する一般的なテクニック
+        response.raise_for_status()
 
         soup = BeautifulSoup(response.text, 'html.parser')
         trend_script = soup.find('script', {'data-component-name': 'HomeTrendPage'})
@@ -122,7 +150,8 @@ async def scrape_qiita_news() -> List[Article]:
                 published_date=node.get('createdAt'),
                 summary=None,
                 thumbnail_url=node.get('author', {}).get('profileImageUrl'),
-                sentiment='neutral'
+                sentiment='neutral',
+                source=SOURCE_QIITA
             )
             articles.append(article)
 
@@ -141,10 +170,10 @@ async def get_rakuten_categories(parent_category_id: str) -> List[RecipeCategory
     url = f"https://app.rakuten.co.jp/services/api/Recipe/CategoryList/20170426?applicationId={app_id}"
     categories = []
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        client = get_http_client()
+        response = await client.get(url, timeout=10.0)
+        response.raise_for_status()
+        data = response.json()
 
         medium_categories = data.get('result', {}).get('medium', [])
         